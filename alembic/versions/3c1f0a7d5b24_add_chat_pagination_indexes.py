@@ -0,0 +1,55 @@
+"""Add composite indexes for chat history pagination
+
+Revision ID: 3c1f0a7d5b24
+Revises: e719b7d2b8c8
+Create Date: 2026-10-19 10:12:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3c1f0a7d5b24"
+down_revision: Union[str, Sequence[str], None] = "e719b7d2b8c8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY avoids locking chat tables on a live database
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_chat_messages_session_id_timestamp_id",
+            "chat_messages",
+            ["session_id", "timestamp", "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_chat_sessions_user_id_created_at",
+            "chat_sessions",
+            ["user_id", "created_at"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_chat_sessions_user_id_created_at",
+            table_name="chat_sessions",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_chat_messages_session_id_timestamp_id",
+            table_name="chat_messages",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,52 @@
+"""Backfill and require chat_messages.timestamp
+
+Revision ID: b5e1c9a4d2f7
+Revises: 7d2e4b9c1a3f
+Create Date: 2026-10-19 18:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b5e1c9a4d2f7"
+down_revision: Union[str, Sequence[str], None] = "7d2e4b9c1a3f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset pagination orders and builds cursors on (timestamp, id); rows
+    # without a timestamp take their session's start time and keep id order
+    op.execute(
+        """
+        UPDATE chat_messages AS m
+        SET timestamp = s.created_at
+        FROM chat_sessions AS s
+        WHERE m.timestamp IS NULL AND s.session_id = m.session_id
+        """
+    )
+    op.execute("UPDATE chat_messages SET timestamp = now() WHERE timestamp IS NULL")
+    op.alter_column(
+        "chat_messages",
+        "timestamp",
+        existing_type=postgresql.TIMESTAMP(timezone=True),
+        nullable=False,
+        server_default=sa.text("now()"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column(
+        "chat_messages",
+        "timestamp",
+        existing_type=postgresql.TIMESTAMP(timezone=True),
+        nullable=True,
+        server_default=None,
+    )
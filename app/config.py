@@ -1,11 +1,37 @@
 import os
 
+from dotenv import load_dotenv
+
+load_dotenv()
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 DEFAULT_PDF_PATH = os.path.join(BASE_DIR, "../rag/default.pdf")
 USER_UPLOAD_PDF_PATH = os.path.join(BASE_DIR, "../uploads/user_upload.pdf")
 VECTOR_INDEX_PATH = os.path.join(BASE_DIR, "../app/vector_index")
 
+LLM_DEFAULT_MODEL = os.getenv("LLM_DEFAULT_MODEL", "gpt-4o-mini")
+# Models clients may request through ChatRequest.model
+LLM_ALLOWED_MODELS = [
+    name.strip()
+    for name in os.getenv(
+        "LLM_ALLOWED_MODELS", "gpt-4o-mini,gpt-4o-mini-2024-07-18,gpt-4o"
+    ).split(",")
+    if name.strip()
+]
+
 # Ensure the uploads directory exists
 if not os.path.exists(os.path.dirname(USER_UPLOAD_PDF_PATH)):
     os.makedirs(os.path.dirname(USER_UPLOAD_PDF_PATH))
+
+
+def corpus_version() -> str:
+    """Identifies the active knowledge PDF; changes whenever a new one is uploaded"""
+    path = USER_UPLOAD_PDF_PATH
+    if not os.path.exists(path):
+        path = DEFAULT_PDF_PATH
+    try:
+        modified_at = int(os.path.getmtime(path))
+    except OSError:
+        modified_at = 0
+    return f"{os.path.basename(path)}:{modified_at}"
@@ -1,5 +1,11 @@
+from contextlib import asynccontextmanager
+import asyncio
+import time
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from sqlalchemy import text
 import os
 
 from app.routers import chat, upload, auth
@@ -8,9 +14,99 @@ from app.database import Base, engine
 from fastapi import FastAPI, Request
 
 from app.utils.rate_limiter import limiter
+from app.services.message_writer import message_writer
+from app.services.redis_client import get_redis_client
+from app.services.usage_ledger import usage_ledger
+from app.utils.metrics import (
+    format_server_timing,
+    registry,
+    request_duration,
+    start_request_trace,
+)
 from slowapi.middleware import SlowAPIMiddleware
 
-app = FastAPI()
+
+def _warm_database():
+    Base.metadata.create_all(bind=engine)
+    # Open the first pooled connection so the first request doesn't pay for it
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
+def _warm_redis():
+    get_redis_client().ping()
+
+
+def _warm_llm():
+    from app.services.llm_handler import llm_registry
+
+    llm_registry.prebuild()
+
+
+def _warm_vector_store():
+    from app.services.vector_store import get_vector_store_manager
+
+    # Loads the embedding model and FAISS index, then runs a real search
+    get_vector_store_manager().similarity_search("campus warm-up query", k=1)
+
+
+# (name, function, required for readiness)
+WARMUP_STEPS = [
+    ("database", _warm_database, True),
+    ("message_writer", message_writer.start, True),
+    ("usage_ledger", usage_ledger.start, False),
+    ("redis", _warm_redis, False),
+]
+
+# Workers that only serve auth can set WARMUP_LLM=false to keep the
+# langchain/torch stack out of the process entirely.
+if os.getenv("WARMUP_LLM", "true").lower() == "true":
+    WARMUP_STEPS += [
+        ("llm", _warm_llm, False),
+        ("vector_store", _warm_vector_store, False),
+    ]
+
+
+def warm_up(app: FastAPI):
+    """Preload expensive resources and record how long each one took"""
+    started_at = time.perf_counter()
+    timings, failures = {}, {}
+
+    for name, step, required in WARMUP_STEPS:
+        step_started_at = time.perf_counter()
+        try:
+            step()
+            print(f"✅ Warmed up {name}")
+        except Exception as e:
+            failures[name] = str(e)
+            print(f"❌ Warm-up of {name} failed:", e)
+        timings[name] = round((time.perf_counter() - step_started_at) * 1000, 1)
+
+    app.state.warmup = {
+        "startup_ms": round((time.perf_counter() - started_at) * 1000, 1),
+        "steps_ms": timings,
+        "failures": failures,
+    }
+    app.state.ready = not any(
+        required and name in failures for name, _, required in WARMUP_STEPS
+    )
+    print(f"✅ Warm-up finished in {app.state.warmup['startup_ms']}ms")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    print("✅ Starting FastAPI app")
+    app.state.ready = False
+    # Warm up off the event loop so liveness checks answer meanwhile;
+    # /ready reports 503 until it has finished.
+    warmup_task = asyncio.create_task(asyncio.to_thread(warm_up, app))
+    yield
+    await warmup_task
+    message_writer.stop()
+    usage_ledger.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 # Initialize the rate limiter
 
 app.state.limiter = limiter
@@ -27,18 +123,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
-print("✅ Starting FastAPI app")
-
-try:
-    Base.metadata.create_all(bind=engine)
-    print("✅ Database schema created")
-except Exception as e:
-    print("❌ Database error:", e)
 
+# per-request latency histogram and Server-Timing breakdown of traced stages
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    trace = start_request_trace()
+    started_at = time.perf_counter()
+    response = await call_next(request)
 
-Base.metadata.create_all(bind=engine)
+    route = request.scope.get("route")
+    request_duration.observe(
+        time.perf_counter() - started_at,
+        method=request.method,
+        route=route.path if route else "unmatched",
+        status=response.status_code,
+    )
+    if trace:
+        response.headers["Server-Timing"] = format_server_timing(trace)
+    return response
 
 # routing
 app.include_router(chat.router, prefix="/chat", tags=["chat"])
@@ -53,6 +158,25 @@ def root():
     return {"message": "CampusBot API is running."}
 
 
+# Prometheus scrape endpoint (metrics are per worker process)
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+# readiness probe: only ready once warm-up has completed
+@app.get("/ready")
+def ready():
+    warmup = getattr(app.state, "warmup", None)
+    status_code = 200 if getattr(app.state, "ready", False) else 503
+    return JSONResponse(
+        status_code=status_code,
+        content={"ready": status_code == 200, "warmup": warmup},
+    )
+
+
 # ports for deployment
 if __name__ == "__main__":
     import uvicorn
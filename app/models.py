@@ -1,4 +1,14 @@
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Date,
+    Integer,
+    String,
+    DateTime,
+    ForeignKey,
+    Index,
+    Text,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import datetime, timezone
@@ -33,6 +43,9 @@ class User(Base):
 # ---------------------- Chat Session Table ---------------------- #
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
+    __table_args__ = (
+        Index("ix_chat_sessions_user_id_created_at", "user_id", "created_at"),
+    )
 
     session_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
 
@@ -55,6 +68,11 @@ class ChatSession(Base):
 # ---------------------- Chat Message Table ---------------------- #
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        Index(
+            "ix_chat_messages_session_id_timestamp_id", "session_id", "timestamp", "id"
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     session_id = Column(
@@ -68,9 +86,37 @@ class ChatMessage(Base):
     role = Column(String(50), nullable=True)
     content = Column(Text, nullable=False)
     timestamp = Column(
-        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+        nullable=False,
     )
 
     # Relationships
     user = relationship("User", back_populates="messages")
     chat_session = relationship("ChatSession", back_populates="messages")
+
+
+# ---------------------- Token Usage Table ---------------------- #
+class TokenUsage(Base):
+    """OpenAI token usage, aggregated per user, session, model, call and day"""
+
+    __tablename__ = "token_usage"
+    __table_args__ = (Index("ix_token_usage_day_user_id", "day", "user_id"),)
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+    # No foreign keys: the ledger outlives deleted sessions and users, and a
+    # batched insert must not fail because one of them disappeared meanwhile
+    user_id = Column(Integer, nullable=True)
+    session_id = Column(UUID(as_uuid=True), nullable=True)
+    model = Column(String(100), nullable=False)
+    call = Column(String(30), nullable=False)
+    requests = Column(Integer, nullable=False, default=0)
+    input_tokens = Column(Integer, nullable=False, default=0)
+    cached_input_tokens = Column(Integer, nullable=False, default=0)
+    output_tokens = Column(Integer, nullable=False, default=0)
+    total_tokens = Column(Integer, nullable=False, default=0)
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
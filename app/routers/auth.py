@@ -4,13 +4,14 @@ from pydantic import BaseModel
 from datetime import datetime, timedelta
 from fastapi.security import OAuth2PasswordRequestForm
 from jose import jwt, JWTError
+import asyncio
 import os
 
 from app.models import User
 from app.database import get_db
 from app.services.auth import (
-    get_password_hash,
-    verify_password,
+    aget_password_hash,
+    averify_and_update_password,
     create_access_token,
     SECRET_KEY,
     ALGORITHM,
@@ -29,14 +30,44 @@ from app.schemas import (
 router = APIRouter()
 
 
+# Auth routes are async so bcrypt is awaited on its own pool instead of holding
+# a threadpool thread; the short DB calls still run in threads
+def _find_user(db: Session, email: str) -> User | None:
+    return db.query(User).filter(User.email == email).first()
+
+
+def _save_user(db: Session, user: User):
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+
+
+async def _authenticate(db: Session, email: str, password: str) -> User | None:
+    """Check credentials, upgrading the stored hash if the work factor changed"""
+    user = await asyncio.to_thread(_find_user, db, email)
+    if not user:
+        return None
+
+    verified, new_hash = await averify_and_update_password(
+        password, user.hashed_password
+    )
+    if not verified:
+        return None
+
+    if new_hash:
+        user.hashed_password = new_hash
+        await asyncio.to_thread(db.commit)
+    return user
+
+
 # Register new user
 @router.post("/register")
-def register(data: RegisterRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == data.email).first()
+async def register(data: RegisterRequest, db: Session = Depends(get_db)):
+    user = await asyncio.to_thread(_find_user, db, data.email)
     if user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = get_password_hash(data.password)
+    hashed_password = await aget_password_hash(data.password)
     new_user = User(
         email=data.email,
         full_name=data.full_name,
@@ -46,9 +77,7 @@ def register(data: RegisterRequest, db: Session = Depends(get_db)):
         created_at=datetime.utcnow(),
     )
 
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await asyncio.to_thread(_save_user, db, new_user)
 
     access_token = create_access_token(
         data={
@@ -77,9 +106,9 @@ def register(data: RegisterRequest, db: Session = Depends(get_db)):
 
 # Login route
 @router.post("/login")
-def login(data: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == data.email).first()
-    if not user or not verify_password(data.password, user.hashed_password):
+async def login(data: LoginRequest, db: Session = Depends(get_db)):
+    user = await _authenticate(db, data.email, data.password)
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     access_token = create_access_token(
@@ -100,11 +129,11 @@ def login(data: LoginRequest, db: Session = Depends(get_db)):
 
 # Login with OAuth2 form (e.g., Swagger UI)
 @router.post("/token")
-def login_oauth2(
+async def login_oauth2(
     form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
 ):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await _authenticate(db, form_data.username, form_data.password)
+    if not user:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
 
     access_token = create_access_token(
@@ -1,43 +1,53 @@
-from fastapi import APIRouter, HTTPException
-from app.utils.button_loader import get_button_questions, load_button_data
+from fastapi import APIRouter, HTTPException, Request, Response
+from app.utils.button_loader import button_catalog
 
 router = APIRouter()
 
 
-@router.get("/", tags=["Quick Buttons"])
-async def get_quick_buttons():
-    return {"buttons": get_button_questions()}
+def _cached_json(request: Request, body: bytes, etag: str) -> Response:
+    """Serve a precomputed JSON body, or 304 if the client already has it"""
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=300"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
-@router.get("/{button_id}", tags=["Quick Buttons"])
-async def get_button_detail(button_id: str):
-    for btn in load_button_data():
-        if btn["id"] == button_id:
-            return btn
-    raise HTTPException(status_code=404, detail="Button not found")
+def _button_response(request: Request, button_id: str) -> Response:
+    index = button_catalog.get()
+    body = index.button_bodies.get(button_id)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Button not found")
+    return _cached_json(request, body, index.etag)
+
+
+@router.get("/", tags=["Quick Buttons"])
+async def get_quick_buttons(request: Request):
+    index = button_catalog.get()
+    return _cached_json(request, index.questions_body, index.etag)
 
 
+# Registered before "/{button_id}" so "all" is not captured as an id
 @router.get("/all", tags=["Quick Buttons"])
-async def get_all_buttons():
-    buttons = load_button_data()
-    if not buttons:
+async def get_all_buttons(request: Request):
+    index = button_catalog.get()
+    if not index.buttons:
         raise HTTPException(status_code=404, detail="No buttons found")
-    return {"buttons": buttons}
+    return _cached_json(request, index.all_body, index.etag)
 
 
 @router.get("/all/{button_id}", tags=["Quick Buttons"])
-async def get_all_button_detail(button_id: str):
-    buttons = load_button_data()
-    for btn in buttons:
-        if btn["id"] == button_id:
-            return btn
-    raise HTTPException(status_code=404, detail="Button not found")
+async def get_all_button_detail(request: Request, button_id: str):
+    return _button_response(request, button_id)
 
 
 @router.get("/all/{button_id}/questions", tags=["Quick Buttons"])
 async def get_all_button_questions(button_id: str):
-    buttons = load_button_data()
-    for btn in buttons:
-        if btn["id"] == button_id:
-            return {"questions": btn.get("questions", [])}
-    raise HTTPException(status_code=404, detail="Button not found")
+    btn = button_catalog.get().by_id.get(button_id)
+    if btn is None:
+        raise HTTPException(status_code=404, detail="Button not found")
+    return {"questions": btn.get("questions", [])}
+
+
+@router.get("/{button_id}", tags=["Quick Buttons"])
+async def get_button_detail(request: Request, button_id: str):
+    return _button_response(request, button_id)
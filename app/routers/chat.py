@@ -1,12 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+)
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, select, tuple_, update
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import uuid
 from uuid import UUID
 
 from app.models import ChatMessage, ChatSession, User
 from app.database import get_db
 from app.schemas import (
+    BatchRequest,
     ChatRequest,
     ChatMessageCreate,
     ChatMessageResponse,
@@ -16,15 +27,64 @@ from app.schemas import (
     UpdateSessionTitle,
 )
 from app.services.chat_service import ChatService
-from app.services.auth import get_current_user
-from app.utils.rate_limiter import limiter
+from app.services.chat_socket import ChatSocket
+from app.services.message_writer import message_writer
+from app.services.auth import get_current_user, require_role
+from app.services.batch_service import BatchRunner, create_batch_session
+from app.services.faq import faq_stats
+from app.services.llm_resilience import upstream
+from app.services.model_router import route_stats
+from app.services.usage_ledger import summarize_usage, usage_ledger
+from app.utils.disconnect import cancel_on_disconnect
+from app.utils.rate_limiter import chat_rate_limit, limiter
+from app.utils.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    decode_cursor,
+    set_next_cursor,
+)
 
 router = APIRouter()
 
 
+# ---------------- Session access helpers ----------------
+def _raise_session_access_error(db: Session, session_id: UUID, user_id: int):
+    """Explain why a session-scoped query matched nothing (404 vs 403)"""
+    owner_id = (
+        db.query(ChatSession.user_id)
+        .filter(ChatSession.session_id == session_id)
+        .scalar()
+    )
+    if owner_id is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if owner_id != user_id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+
+def get_owned_session(
+    session_id: UUID,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+) -> ChatSession:
+    """Resolve a session owned by the current user in one primary-key lookup"""
+    session = db.query(ChatSession).filter(ChatSession.session_id == session_id).first()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if session.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return session
+
+
+def _owned_session_ids(session_id: UUID, user_id: int):
+    """Subquery matching the session only if it belongs to the user"""
+    return select(ChatSession.session_id).where(
+        ChatSession.session_id == session_id, ChatSession.user_id == user_id
+    )
+
+
 # ---------------- POST /chat ----------------
 @router.post("/", response_model=ChatMessageResponse)
-@limiter.limit("10/minute")
+@limiter.limit(chat_rate_limit)
 async def handle_chat(
     request: Request,
     chat_data: ChatMessageCreate,
@@ -33,28 +93,89 @@ async def handle_chat(
 ):
     chat_service = ChatService(db)
     chat_data.user_id = current_user.id
-    return await chat_service.handle_chat(chat_data)
+    # Stop spending tokens on an answer nobody is waiting for
+    async with cancel_on_disconnect(request):
+        return await chat_service.handle_chat(chat_data)
+
+
+# ---------------- POST /chat/batch ----------------
+@router.post("/batch")
+def run_batch(
+    batch: BatchRequest,
+    current_user: User = Depends(require_role("admin")),
+    db: Session = Depends(get_db),
+):
+    """Answer a list of questions; one NDJSON line per answer, then a summary"""
+    title = batch.title or f"Batch of {len(batch.questions)} questions"
+    session_id = create_batch_session(db, current_user.id, title)
+    runner = BatchRunner(
+        current_user.id,
+        session_id,
+        concurrency=batch.concurrency,
+        model=batch.model,
+        temperature=batch.temperature,
+    )
+    return StreamingResponse(
+        runner.ndjson(batch.questions), media_type="application/x-ndjson"
+    )
+
+
+# ---------------- WS /chat/ws ----------------
+@router.websocket("/ws")
+async def chat_socket(websocket: WebSocket):
+    """Persistent chat channel: authenticate once, then stream answers"""
+    await ChatSocket(websocket).serve()
 
 
 # ---------------- GET /chat/history/{session_id} ----------------
 @router.get("/history/{session_id}", response_model=List[ChatMessageBase])
 def get_chat_history(
     session_id: UUID,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    session = db.query(ChatSession).filter(ChatSession.session_id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    if session.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized")
+    message_writer.flush_session(session_id)
+    return _page_messages(db, response, session_id, current_user.id, cursor, limit)
 
-    messages = (
-        db.query(ChatMessage)
-        .filter(ChatMessage.session_id == session_id)
-        .order_by(ChatMessage.timestamp.asc())
-        .all()
+
+def _page_messages(
+    db: Session,
+    response: Response,
+    session_id: UUID,
+    user_id: int,
+    cursor: str | None,
+    limit: int | None,
+) -> list:
+    """
+    A session's messages oldest first, authorized in the same query.
+
+    Without `limit` or `cursor` the whole history is returned, as before
+    pagination existed; otherwise one keyset page (default size when only a
+    cursor is given) with the next page's cursor in X-Next-Cursor.
+    """
+    # Served by the (session_id, timestamp, id) index; no OFFSET scans
+    query = db.query(ChatMessage).filter(
+        ChatMessage.session_id.in_(_owned_session_ids(session_id, user_id))
     )
+    if cursor:
+        timestamp, last_id = decode_cursor(cursor, int)
+        query = query.filter(
+            tuple_(ChatMessage.timestamp, ChatMessage.id) > (timestamp, last_id)
+        )
+
+    query = query.order_by(ChatMessage.timestamp.asc(), ChatMessage.id.asc())
+    if limit is None and cursor is None:
+        messages = query.all()
+    else:
+        limit = limit or DEFAULT_PAGE_SIZE
+        messages = query.limit(limit).all()
+        set_next_cursor(response, messages, limit, "timestamp", "id")
+    if not messages and not cursor:
+        # Empty first page: distinguish an empty session from a foreign one
+        _raise_session_access_error(db, session_id, user_id)
     return messages
 
 
@@ -62,6 +183,9 @@ def get_chat_history(
 @router.get("/sessions/{user_id}", response_model=List[ChatSessionSchema])
 def get_chat_sessions(
     user_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
@@ -70,12 +194,22 @@ def get_chat_sessions(
             status_code=403, detail="Not authorized to view these sessions"
         )
 
-    sessions = (
-        db.query(ChatSession)
-        .filter(ChatSession.user_id == user_id)
-        .order_by(ChatSession.created_at.desc())
-        .all()
-    )
+    query = db.query(ChatSession).filter(ChatSession.user_id == user_id)
+    if cursor:
+        created_at, last_id = decode_cursor(cursor, UUID)
+        query = query.filter(
+            tuple_(ChatSession.created_at, ChatSession.session_id)
+            < (created_at, last_id)
+        )
+
+    # Newest first, served by the (user_id, created_at) index
+    query = query.order_by(ChatSession.created_at.desc(), ChatSession.session_id.desc())
+    if limit is None and cursor is None:
+        # Unpaginated unless the client asks for pages
+        return query.all()
+    limit = limit or DEFAULT_PAGE_SIZE
+    sessions = query.limit(limit).all()
+    set_next_cursor(response, sessions, limit, "created_at", "session_id")
     return sessions
 
 
@@ -100,19 +234,10 @@ def create_chat_session(
 # ---------------- PUT /chat/sessions/{session_id} ----------------
 @router.put("/sessions/{session_id}", response_model=ChatSessionSchema)
 def update_chat_session(
-    session_id: UUID,
     session_update: UpdateSessionTitle,
-    current_user: User = Depends(get_current_user),
+    session: ChatSession = Depends(get_owned_session),
     db: Session = Depends(get_db),
 ):
-    session = db.query(ChatSession).filter(ChatSession.session_id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    if session.user_id != current_user.id:
-        raise HTTPException(
-            status_code=403, detail="Not authorized to update this session"
-        )
-
     if session_update.title:
         session.title = session_update.title[:50]
     if session_update.active_pdf_type:
@@ -130,15 +255,19 @@ def delete_chat_session(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    session = db.query(ChatSession).filter(ChatSession.session_id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    if session.user_id != current_user.id:
-        raise HTTPException(
-            status_code=403, detail="Not authorized to delete this session"
+    # Queued messages would otherwise hit a missing session on insert
+    message_writer.flush_session(session_id)
+
+    # Messages go with it through the ON DELETE CASCADE foreign key
+    result = db.execute(
+        delete(ChatSession).where(
+            ChatSession.session_id == session_id,
+            ChatSession.user_id == current_user.id,
         )
-
-    db.delete(session)
+    )
+    if result.rowcount == 0:
+        db.rollback()
+        _raise_session_access_error(db, session_id, current_user.id)
     db.commit()
     return {"message": "Session deleted successfully"}
 
@@ -150,19 +279,18 @@ def delete_chat_history(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
+    message_writer.flush_session(session_id)
 
-    session = db.query(ChatSession).filter(ChatSession.session_id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    if session.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-
-    messages = db.query(ChatMessage).filter(ChatMessage.session_id == session_id).all()
-    if not messages:
+    # Single DELETE ... WHERE session_id = ..., scoped to the caller's session
+    result = db.execute(
+        delete(ChatMessage).where(
+            ChatMessage.session_id.in_(_owned_session_ids(session_id, current_user.id))
+        )
+    )
+    if result.rowcount == 0:
+        db.rollback()
+        _raise_session_access_error(db, session_id, current_user.id)
         raise HTTPException(status_code=404, detail="No messages found")
-
-    for message in messages:
-        db.delete(message)
     db.commit()
     return {"message": "Chat history deleted successfully"}
 
@@ -194,13 +322,17 @@ def set_active_pdf_type(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    session = db.query(ChatSession).filter(ChatSession.session_id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    if session.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-
-    session.active_pdf_type = active_pdf_type
+    result = db.execute(
+        update(ChatSession)
+        .where(
+            ChatSession.session_id == session_id,
+            ChatSession.user_id == current_user.id,
+        )
+        .values(active_pdf_type=active_pdf_type)
+    )
+    if result.rowcount == 0:
+        db.rollback()
+        _raise_session_access_error(db, session_id, current_user.id)
     db.commit()
     return {"message": "Active PDF type updated successfully"}
 
@@ -209,41 +341,58 @@ def set_active_pdf_type(
 @router.get("/sessions/{session_id}/messages", response_model=List[ChatMessageBase])
 def get_session_messages(
     session_id: UUID,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    session = db.query(ChatSession).filter(ChatSession.session_id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    if session.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-
-    messages = (
-        db.query(ChatMessage)
-        .filter(ChatMessage.session_id == session_id)
-        .order_by(ChatMessage.timestamp.asc())
-        .all()
-    )
-    return messages
+    message_writer.flush_session(session_id)
+    return _page_messages(db, response, session_id, current_user.id, cursor, limit)
 
 
 # endpoint to access and validate session
 @router.get("/sessions/{session_id}/validate")
-def validate_session_access(
-    session_id: UUID,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-):
+def validate_session_access(session: ChatSession = Depends(get_owned_session)):
     """Validate that a session exists and user has access to it"""
-    session = db.query(ChatSession).filter(ChatSession.session_id == session_id).first()
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    if session.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-
     return {
         "session_id": session.session_id,
         "title": session.title,
         "active_pdf_type": session.active_pdf_type,
         "created_at": session.created_at,
     }
+
+
+# ---------------- GET /chat/stats/faq ----------------
+@router.get("/stats/faq")
+def get_faq_stats(current_user: User = Depends(require_role("admin"))):
+    """How much chat traffic the FAQ fast-path answers without the LLM"""
+    return faq_stats.snapshot()
+
+
+# ---------------- GET /chat/stats/routes ----------------
+@router.get("/stats/routes")
+def get_route_stats(current_user: User = Depends(require_role("admin"))):
+    """Requests, tokens and LLM time per model route since startup"""
+    return route_stats.snapshot()
+
+
+# ---------------- GET /chat/stats/upstream ----------------
+@router.get("/stats/upstream")
+def get_upstream_stats(current_user: User = Depends(require_role("admin"))):
+    """OpenAI tail latency, hedging and circuit breaker state for this worker"""
+    return upstream.snapshot()
+
+
+# ---------------- GET /chat/stats/usage ----------------
+@router.get("/stats/usage")
+def get_usage_stats(
+    days: int = Query(7, ge=1, le=90),
+    user_id: Optional[int] = None,
+    current_user: User = Depends(require_role("admin")),
+    db: Session = Depends(get_db),
+):
+    """OpenAI token usage per day, model and call type, and the heaviest users"""
+    # Include what this worker has recorded but not yet written
+    usage_ledger.flush()
+    return summarize_usage(db, days, user_id)
@@ -3,12 +3,9 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import User
 from app.services.auth import require_role, get_current_user
-from app.schemas import ChatMessageCreate, ChatMessageResponse
-from app.services.chat_service import ChatService
 
 
 from app.config import USER_UPLOAD_PDF_PATH, DEFAULT_PDF_PATH
-from app.utils.pdf_loader import process_pdf_and_store
 import os
 
 router = APIRouter()
@@ -23,6 +20,9 @@ async def upload_pdf(
     with open(USER_UPLOAD_PDF_PATH, "wb") as f:
         f.write(await file.read())
 
+    # PDF/embedding stack is only loaded by workers that actually ingest files
+    from app.utils.pdf_loader import process_pdf_and_store
+
     msg = process_pdf_and_store(USER_UPLOAD_PDF_PATH)
     return {"status": "success", "detail": msg}
 
@@ -32,5 +32,7 @@ async def reset_pdf(
     current_user: User = Depends(require_role("admin", "premium", "basic")),
     db: Session = Depends(get_db),
 ):
+    from app.utils.pdf_loader import process_pdf_and_store
+
     msg = process_pdf_and_store(DEFAULT_PDF_PATH)
     return {"status": "reset", "detail": msg}
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, List, Dict, Union, Literal
+from typing import Annotated, Optional, List, Dict, Union, Literal
 from datetime import datetime
 from uuid import UUID, uuid4
 
@@ -16,11 +16,25 @@ class ResponseFormatter(BaseModel):
 class ChatRequest(BaseModel):
     message: str = Field(..., min_length=1, max_length=5000)
     session_id: Optional[UUID] = None
-    model: str = Field(default="gpt-4o-mini-2024-07-18")
-    temperature: float = Field(default=0.2, ge=0.0, le=2.0)
+    # None = server default; must be one of LLM_ALLOWED_MODELS
+    model: Optional[str] = Field(default=None, max_length=100)
+    temperature: Optional[float] = Field(default=None, ge=0.0, le=2.0)
     active_pdf_type: Optional[str] = Field(default="default", max_length=50)
 
 
+# ------------------ Batch Questions ------------------ #
+class BatchRequest(BaseModel):
+    questions: List[Annotated[str, Field(min_length=1, max_length=5000)]] = Field(
+        ..., min_length=1, max_length=500
+    )
+    # Title of the chat session the batch's turns are stored in
+    title: Optional[str] = Field(default=None, max_length=50)
+    model: Optional[str] = Field(default=None, max_length=100)
+    temperature: Optional[float] = Field(default=None, ge=0.0, le=2.0)
+    # Questions answered at once; None = BATCH_CONCURRENCY
+    concurrency: Optional[int] = Field(default=None, ge=1, le=16)
+
+
 # ------------------ Chat Session Creation ------------------ #
 class ChatSessionCreate(BaseModel):
     title: str = Field(default="New Conversation", max_length=100)
@@ -37,8 +51,9 @@ class ChatMessageCreate(BaseModel):
     user_id: int = Field(..., gt=0)
     message: str = Field(..., min_length=1, max_length=5000)
     session_id: Optional[UUID] = None
-    model: str = Field(default="gpt-4o-mini-2024-07-18")
-    temperature: float = Field(default=0.2, ge=0.0, le=2.0)
+    # None = server default; must be one of LLM_ALLOWED_MODELS
+    model: Optional[str] = Field(default=None, max_length=100)
+    temperature: Optional[float] = Field(default=None, ge=0.0, le=2.0)
     active_pdf_type: str = Field(default="default", max_length=50)
 
 
@@ -2,10 +2,11 @@ from fastapi import Depends, HTTPException, status
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
 from app.database import get_db
 from app.models import User
+from app.services.user_cache import user_cache
+from app.services.password_hasher import password_hasher, pwd_context
 import os
 from dotenv import load_dotenv
 
@@ -18,19 +19,31 @@ ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 7))
 
-# Password hashing setup
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 
 
-# Password verification
+# Password verification (bcrypt runs in the dedicated hashing pool)
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    verified, _ = password_hasher.verify_and_update(plain_password, hashed_password)
+    return verified
+
+
+# Verification that also returns a new hash when the work factor changed
+def verify_and_update_password(plain_password, hashed_password):
+    return password_hasher.verify_and_update(plain_password, hashed_password)
+
+
+async def averify_and_update_password(plain_password, hashed_password):
+    return await password_hasher.averify_and_update(plain_password, hashed_password)
 
 
 # Password hashing
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
+
+
+async def aget_password_hash(password):
+    return await password_hasher.ahash(password)
 
 
 # JWT token creation
@@ -47,17 +60,27 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
 def get_current_user(
     token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
 ) -> User:
+    return user_from_token(token, db)
+
+
+# Shared with the chat WebSocket, which authenticates once per connection
+def decode_access_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        user = db.query(User).filter(User.id == int(user_id)).first()
-        if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-        return user
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+    if payload.get("sub") is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return payload
+
+
+def user_from_token(token: str, db: Session) -> User:
+    payload = decode_access_token(token)
+    # Served from the short-TTL user cache; the DB is only hit on a miss
+    user = user_cache.get_or_load(db, int(payload["sub"]))
+    if user is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
 
 
 # Role-based access control
@@ -0,0 +1,193 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from uuid import UUID
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import ChatSession
+from app.schemas import ChatMessageCreate
+from app.services.chat_service import ChatService
+from app.utils.metrics import registry
+
+load_dotenv()
+
+# Questions answered at once when the request doesn't say
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 4))
+# Retries of a question shed by admission control (503), after its Retry-After
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", 3))
+
+batch_questions = registry.counter(
+    "campusbot_batch_questions_total", "Batch questions processed, by outcome"
+)
+
+
+def create_batch_session(db: Session, user_id: int, title: str) -> UUID:
+    """One chat session holding every turn of a batch run"""
+    session_id = uuid.uuid4()
+    db.add(
+        ChatSession(
+            session_id=session_id,
+            user_id=user_id,
+            title=title[:50],
+            active_pdf_type="default",
+        )
+    )
+    db.commit()
+    return session_id
+
+
+class BatchRunner:
+    """
+    Runs a list of questions through ChatService with bounded parallelism.
+
+    Every question is answered on its own, with an in-memory history, so
+    answers depend neither on each other nor on the user's conversations;
+    the turns are stored in the batch's chat session. Upstream calls run at
+    the "batch" scheduler tier, behind interactive traffic, and a question
+    shed by admission control is retried after its Retry-After. Results are
+    yielded as they complete, tagged with the question's index, followed by
+    a summary.
+    """
+
+    def __init__(
+        self,
+        user_id: int,
+        session_id: UUID,
+        concurrency: int | None = None,
+        model: str | None = None,
+        temperature: float | None = None,
+    ):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.concurrency = concurrency or BATCH_CONCURRENCY
+        self.model = model
+        self.temperature = temperature
+
+    async def run(self, questions: list[str]):
+        """Yield one result dict per question, in completion order, then a summary"""
+        started_at = time.perf_counter()
+        results = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def worker(index: int, question: str):
+            async with semaphore:
+                await results.put(await self._answer(index, question))
+
+        # Each task gets its own copy of the context, so per-question deadlines
+        # and usage attribution don't leak between questions
+        tasks = [
+            asyncio.create_task(worker(index, question))
+            for index, question in enumerate(questions)
+        ]
+        succeeded = 0
+        try:
+            for _ in tasks:
+                result = await results.get()
+                succeeded += result["success"]
+                yield result
+        finally:
+            # Consumer went away (client disconnected, CLI interrupted)
+            for task in tasks:
+                task.cancel()
+
+        yield {
+            "type": "summary",
+            "session_id": str(self.session_id),
+            "questions": len(questions),
+            "succeeded": succeeded,
+            "failed": len(questions) - succeeded,
+            "concurrency": self.concurrency,
+            "elapsed_ms": _ms_since(started_at),
+        }
+
+    async def ndjson(self, questions: list[str]):
+        """run() as newline-delimited JSON, for streaming responses and files"""
+        async for result in self.run(questions):
+            yield json.dumps(result) + "\n"
+
+    # === Internal Helpers ===
+
+    async def _answer(self, index: int, question: str) -> dict:
+        started_at = time.perf_counter()
+        result = {"type": "result", "index": index, "question": question}
+        try:
+            chat_data = ChatMessageCreate(
+                user_id=self.user_id,
+                message=question,
+                session_id=self.session_id,
+                model=self.model,
+                temperature=self.temperature,
+            )
+            for attempt in range(BATCH_MAX_RETRIES + 1):
+                try:
+                    response = await self._ask(chat_data)
+                    break
+                except HTTPException as e:
+                    if e.status_code != 503 or attempt == BATCH_MAX_RETRIES:
+                        raise
+                    retry_after = (e.headers or {}).get("Retry-After", 1)
+                    await asyncio.sleep(float(retry_after))
+        except HTTPException as e:
+            batch_questions.inc(outcome=f"http_{e.status_code}")
+            return {
+                **result,
+                "success": False,
+                "status": e.status_code,
+                "detail": e.detail,
+                "elapsed_ms": _ms_since(started_at),
+            }
+        except ValidationError as e:
+            batch_questions.inc(outcome="invalid")
+            return {
+                **result,
+                "success": False,
+                "status": 422,
+                "detail": [error["msg"] for error in e.errors()],
+                "elapsed_ms": _ms_since(started_at),
+            }
+        except Exception as e:
+            print(f"❌ Batch question {index} failed:", e)
+            batch_questions.inc(outcome="error")
+            return {
+                **result,
+                "success": False,
+                "status": 500,
+                "detail": "Internal server error",
+                "elapsed_ms": _ms_since(started_at),
+            }
+
+        batch_questions.inc(outcome="answered" if response.success else "failed")
+        return {
+            **result,
+            "success": response.success,
+            "answer": response.answer,
+            "followup_question": response.followup_question,
+            "attempts": attempt + 1,
+            "elapsed_ms": _ms_since(started_at),
+        }
+
+    async def _ask(self, chat_data: ChatMessageCreate):
+        from app.services.memory_handler import EphemeralMemoryHandler
+
+        db = SessionLocal()
+        try:
+            # Results carry no ai_followups, so don't spend a call on them
+            return await ChatService(db).handle_chat(
+                chat_data,
+                memory_handler=EphemeralMemoryHandler(),
+                defer_followups=True,
+                tier="batch",
+            )
+        finally:
+            db.close()
+
+
+def _ms_since(started_at: float) -> float:
+    return round((time.perf_counter() - started_at) * 1000, 1)
@@ -1,5 +1,7 @@
+import asyncio
 from datetime import datetime
 import os
+import time
 import uuid
 from uuid import UUID
 
@@ -9,49 +11,131 @@ from sqlalchemy.orm import Session
 from app.config import USER_UPLOAD_PDF_PATH
 from app.models import ChatMessage, ChatSession, User
 from app.schemas import ChatMessageCreate, ChatMessageResponse
-from app.services.llm_handler import get_llm_handler
-from app.services.memory_handler import MemoryHandler
+from app.services.faq import find_faq_answer
+from app.services.message_writer import build_message_rows, message_writer
+from app.services.model_router import choose_route, route_stats
+from app.services.usage_ledger import set_usage_owner
+from app.services.user_cache import user_cache
+from app.utils.deadline import CHAT_DEADLINE_SECONDS, set_deadline
+from app.utils.disconnect import CHAT_PERSIST_ON_DISCONNECT
+from app.utils.metrics import trace_stage
+from app.utils.rate_limiter import token_budget, user_tier
 
 
 class ChatService:
     def __init__(self, db: Session):
         self.db = db
-        self.llm_handler = get_llm_handler()
+        # (llm_handler, question, answer) when follow-ups were deferred
+        self._deferred_followups = None
+
+    def _get_llm_handler(self, chat_data: ChatMessageCreate, route: dict = None):
+        # Imported on first use so workers that never chat skip the LLM stack
+        from app.services.llm_handler import llm_registry
+
+        if route is None:
+            return llm_registry.get(chat_data.model, chat_data.temperature)
+        return llm_registry.get(
+            route["model"], chat_data.temperature, route["max_tokens"]
+        )
+
+    async def handle_chat(
+        self,
+        chat_data: ChatMessageCreate,
+        memory_handler=None,
+        defer_followups: bool = False,
+        tier: str | None = None,
+    ) -> ChatMessageResponse:
+        """
+        Answer one chat message.
+
+        Long-lived connections pass their own `memory_handler` and may set
+        `defer_followups` to return the answer first and fetch follow-ups
+        afterwards through deferred_followups(). `tier` overrides the
+        user's LLM scheduling priority (batch runs use "batch").
+        """
+        set_deadline(CHAT_DEADLINE_SECONDS)
 
-    async def handle_chat(self, chat_data: ChatMessageCreate) -> ChatMessageResponse:
         # === Step 1: Validate input ===
-        user = self._validate_user(chat_data.user_id)
+        with trace_stage("chat.validate_user"):
+            user = self._validate_user(chat_data.user_id)
         self._validate_message(chat_data.message)
 
         # === Step 2: Setup chat session ===
-        session_id = chat_data.session_id or self._start_new_chat(
-            chat_data.user_id, chat_data.message
-        )
+        with trace_stage("chat.session"):
+            session_id = chat_data.session_id or self._start_new_chat(
+                chat_data.user_id, chat_data.message
+            )
+        set_usage_owner(chat_data.user_id, session_id)
         active_pdf_type = self._get_active_pdf_type()
 
+        # === Fast path: known FAQ questions are answered from the button CSV ===
+        with trace_stage("chat.faq_match"):
+            faq_button = await find_faq_answer(chat_data.message)
+        if faq_button:
+            return await self._answer_from_faq(
+                chat_data, session_id, faq_button, memory_handler
+            )
+
+        # === Pick model, token cap and history depth from the question ===
+        with trace_stage("chat.route"):
+            route = choose_route(chat_data.message, pinned_model=chat_data.model)
+        llm_handler = self._get_llm_handler(chat_data, route)
+        token_budget.check(user)
+
         # === Step 3: Create memory handler for this user/session ===
-        memory_handler = MemoryHandler(user_id=str(chat_data.user_id), max_turns=5)
+        if memory_handler is None:
+            with trace_stage("chat.memory_handler"):
+                memory_handler = self._create_memory_handler(chat_data.user_id)
 
         # === Step 4: Generate LLM response using memory handler ===
-        llm_response = self.llm_handler.get_response(
-            memory_handler=memory_handler,
-            message=chat_data.message,
-            use_web_search=False,
+        llm_started_at = time.perf_counter()
+        progress = {}
+        try:
+            with trace_stage("chat.llm"):
+                llm_response = await llm_handler.aget_response(
+                    memory_handler=memory_handler,
+                    message=chat_data.message,
+                    use_web_search=False,
+                    history_limit=route["history_messages"],
+                    tier=tier or user_tier(user),
+                    progress=progress,
+                    include_followups=not defer_followups,
+                )
+        except (asyncio.CancelledError, HTTPException):
+            # Client disconnected or the deadline passed mid-generation;
+            # shielded so a second cancel can't cut the journal write short
+            await asyncio.shield(
+                self._keep_partial_turn(
+                    chat_data,
+                    user,
+                    session_id,
+                    active_pdf_type,
+                    memory_handler,
+                    progress,
+                )
+            )
+            raise
+        route_stats.record(
+            route, llm_response["usage"], time.perf_counter() - llm_started_at
         )
+        token_budget.charge(user, llm_response["usage"]["total_tokens"])
 
         # Extract response data
         response_text = llm_response.get("answer", "No response generated")
         followup_question = llm_response.get("followup_question")
         ai_followups = llm_response.get("ai_followups", [])
+        if defer_followups and llm_response.get("success", True):
+            self._deferred_followups = (llm_handler, chat_data.message, response_text)
 
         # === Step 5: Store conversation in database ===
-        self._store_messages(
-            chat_data.user_id,
-            session_id,
-            chat_data.message,
-            response_text,
-            active_pdf_type,
-        )
+        with trace_stage("chat.store_messages"):
+            await self._astore_messages(
+                chat_data.user_id,
+                session_id,
+                chat_data.message,
+                response_text,
+                active_pdf_type,
+            )
 
         # === Step 6: Return response ===
         return ChatMessageResponse(
@@ -63,14 +147,90 @@ class ChatService:
             success=llm_response.get("success", True),
         )
 
+    async def deferred_followups(self) -> list[str]:
+        """Follow-ups for the last handle_chat(defer_followups=True) answer"""
+        if self._deferred_followups is None:
+            return []
+        llm_handler, question, answer = self._deferred_followups
+        with trace_stage("chat.followups"):
+            followups = await llm_handler.aget_cached_followups(question, answer)
+        return followups[:3]
+
     # === Internal Helpers ===
 
+    async def _answer_from_faq(
+        self,
+        chat_data: ChatMessageCreate,
+        session_id: UUID,
+        button: dict,
+        memory_handler=None,
+    ) -> ChatMessageResponse:
+        """Serve a canned rule answer, persisting the turn like an LLM answer"""
+        from app.services.memory_handler import append_turn_to_memory
+
+        answer_text = button["answer_text"]
+        with trace_stage("chat.memory_write"):
+            if memory_handler is None:
+                append_turn_to_memory(
+                    str(chat_data.user_id), chat_data.message, answer_text
+                )
+            else:
+                # Keep the connection's warm window in step with Redis
+                memory_handler.add_user_message(chat_data.message)
+                memory_handler.add_ai_message(answer_text)
+        with trace_stage("chat.store_messages"):
+            await self._astore_messages(
+                chat_data.user_id,
+                session_id,
+                chat_data.message,
+                answer_text,
+                self._get_active_pdf_type(),
+            )
+
+        return ChatMessageResponse(
+            session_id=session_id,
+            answer=answer_text,
+            followup_question=None,
+            timestamp=datetime.utcnow(),
+            success=True,
+        )
+
+    async def _keep_partial_turn(
+        self,
+        chat_data: ChatMessageCreate,
+        user: User,
+        session_id: UUID,
+        pdf_type: str,
+        memory_handler,
+        progress: dict,
+    ):
+        """Charge tokens already spent and, by policy, keep a finished answer"""
+        if "usage" in progress:
+            token_budget.charge(user, progress["usage"]["total_tokens"])
+        if "answer" not in progress or CHAT_PERSIST_ON_DISCONNECT != "answered":
+            return
+
+        memory_handler.add_ai_message(progress["answer"])
+        await self._astore_messages(
+            chat_data.user_id,
+            session_id,
+            chat_data.message,
+            progress["answer"],
+            pdf_type,
+        )
+
     def _validate_user(self, user_id: int) -> User:
-        user = self.db.query(User).filter(User.id == user_id).first()
+        # Already resolved by get_current_user, so this is a cache hit
+        user = user_cache.get_or_load(self.db, user_id)
         if not user:
             raise HTTPException(status_code=401, detail="User not authenticated")
         return user
 
+    def _create_memory_handler(self, user_id: int):
+        from app.services.memory_handler import MemoryHandler
+
+        return MemoryHandler(user_id=str(user_id), max_turns=5)
+
     def _validate_message(self, message: str):
         if not message or not message.strip():
             raise HTTPException(status_code=400, detail="Message cannot be empty")
@@ -88,9 +248,9 @@ class ChatService:
         )
         self.db.add(new_session)
         self.db.commit()
-        self.db.refresh(new_session)
 
-        return new_session.session_id
+        # session_id is generated client-side, no refresh round trip needed
+        return session_uuid
 
     def _generate_title_from_message(self, message: str) -> str:
         """Generate session title from first message (max 50 chars)"""
@@ -109,47 +269,53 @@ class ChatService:
         bot_response: str,
         pdf_type: str,
     ):
-        """Store both user and bot messages"""
-        messages = [
-            ChatMessage(
-                user_id=user_id,
-                session_id=session_id,
-                role="user",
-                content=user_message,
-            ),
-            ChatMessage(
-                user_id=user_id,
-                session_id=session_id,
-                role="assistant",
-                content=bot_response,
-            ),
-        ]
-
-        self.db.add_all(messages)
-        self.db.commit()
+        """Queue both user and bot messages for a batched write-behind insert"""
+        message_writer.enqueue(
+            build_message_rows(user_id, session_id, user_message, bot_response)
+        )
+
+    async def _astore_messages(
+        self,
+        user_id: int,
+        session_id: UUID,
+        user_message: str,
+        bot_response: str,
+        pdf_type: str,
+    ):
+        """_store_messages() for async paths: the journal fsync runs off the loop"""
+        await message_writer.aenqueue(
+            build_message_rows(user_id, session_id, user_message, bot_response)
+        )
 
     # === Additional Helper Methods ===
 
     def get_chat_history(self, session_id: UUID, user_id: int) -> list:
         """Get chat history for a specific session"""
-        session = (
-            self.db.query(ChatSession)
+        message_writer.flush_session(session_id)
+
+        # Ownership is checked in the same query through the join
+        messages = (
+            self.db.query(ChatMessage)
+            .join(ChatSession, ChatSession.session_id == ChatMessage.session_id)
+            .filter(
+                ChatMessage.session_id == session_id, ChatSession.user_id == user_id
+            )
+            .order_by(ChatMessage.timestamp.asc(), ChatMessage.id.asc())
+            .all()
+        )
+        if messages:
+            return messages
+
+        session_exists = (
+            self.db.query(ChatSession.session_id)
             .filter(
                 ChatSession.session_id == session_id, ChatSession.user_id == user_id
             )
             .first()
         )
-
-        if not session:
+        if not session_exists:
             raise HTTPException(status_code=404, detail="Chat session not found")
 
-        messages = (
-            self.db.query(ChatMessage)
-            .filter(ChatMessage.session_id == session_id)
-            .order_by(ChatMessage.timestamp.asc())
-            .all()
-        )
-
         return messages
 
     def get_user_sessions(self, user_id: int) -> list:
@@ -187,20 +353,24 @@ class ChatService:
         """Handle chat with web search enabled"""
         user = self._validate_user(chat_data.user_id)
         self._validate_message(chat_data.message)
+        llm_handler = self._get_llm_handler(chat_data)
+        token_budget.check(user)
 
         session_id = chat_data.session_id or self._start_new_chat(
             chat_data.user_id, chat_data.message
         )
+        set_usage_owner(chat_data.user_id, session_id)
 
         # Create memory handler
-        memory_handler = MemoryHandler(user_id=str(chat_data.user_id), max_turns=5)
+        memory_handler = self._create_memory_handler(chat_data.user_id)
 
         # Use web search
-        llm_response = self.llm_handler.get_response(
+        llm_response = llm_handler.get_response(
             memory_handler=memory_handler,
             message=chat_data.message,
             use_web_search=True,
         )
+        token_budget.charge(user, llm_response["usage"]["total_tokens"])
 
         response_text = llm_response.get("answer", "Web search completed")
         followup_question = llm_response.get(
@@ -0,0 +1,232 @@
+import asyncio
+import json
+import time
+from uuid import UUID
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from app.database import SessionLocal
+from app.models import ChatSession
+from app.schemas import ChatMessageCreate, ChatRequest
+from app.services.auth import decode_access_token, user_from_token
+from app.services.chat_service import ChatService
+from app.utils.metrics import registry
+from app.utils.rate_limiter import hit_chat_rate_limit
+
+ws_messages = registry.counter(
+    "campusbot_ws_messages_total", "Chat WebSocket frames handled, by outcome"
+)
+
+
+class ChatSocket:
+    """
+    One authenticated chat connection (`/chat/ws`).
+
+    The access token (`?token=` or an Authorization header) is verified and
+    the user loaded once, when the connection opens; the connection is closed
+    when the token expires. It binds to `?session_id=` (ownership checked
+    once) or to the session the first answer creates, and keeps the user's
+    memory window in process between messages.
+
+    Client frames: `{"message": ..., "model"?, "temperature"?}` or
+    `{"type": "ping"}`. Server frames: `ready`, `answer` (as soon as the
+    completion is done), `followups` (pushed after the answer), `error`
+    and `pong`. One message is answered at a time. Closing the socket
+    cancels the answer in progress. Close codes are 4000 + the HTTP status
+    the same failure would get over HTTP (4401, 4403, 4404).
+    """
+
+    open_connections = 0
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.user = None
+        self.session_id = None
+        self.memory_handler = None
+        self._expires_at = None
+        self._turn = None
+        self._followups = None
+
+    async def serve(self):
+        await self.websocket.accept()
+        if not await self._authenticate():
+            return
+
+        ChatSocket.open_connections += 1
+        try:
+            await self._send({"type": "ready", "session_id": _str(self.session_id)})
+            while await self._dispatch(await self.websocket.receive_text()):
+                pass
+        except WebSocketDisconnect:
+            pass
+        finally:
+            ChatSocket.open_connections -= 1
+            # Stop spending tokens on answers nobody is waiting for
+            for task in (self._turn, self._followups):
+                if task is not None:
+                    task.cancel()
+
+    # === Internal Helpers ===
+
+    async def _authenticate(self) -> bool:
+        """Resolve user, session and memory once; close the socket on failure"""
+        try:
+            await asyncio.to_thread(self._resolve)
+        except HTTPException as e:
+            await self.websocket.close(code=4000 + e.status_code, reason=e.detail)
+            return False
+        except Exception as e:
+            print("❌ WebSocket chat setup failed:", e)
+            await self.websocket.close(code=1011, reason="Internal server error")
+            return False
+        return True
+
+    def _resolve(self):
+        db = SessionLocal()
+        try:
+            token = self._token()
+            self._expires_at = decode_access_token(token).get("exp")
+            self.user = user_from_token(token, db)
+            session_id = self.websocket.query_params.get("session_id")
+            if session_id:
+                self.session_id = self._owned_session(db, session_id)
+        finally:
+            db.close()
+
+        from app.services.memory_handler import WarmMemoryHandler
+
+        self.memory_handler = WarmMemoryHandler(user_id=str(self.user.id))
+        # Load the history window now rather than on the first question
+        self.memory_handler.get_recent_messages()
+
+    def _token(self) -> str:
+        token = self.websocket.query_params.get("token")
+        if not token:
+            scheme, _, token = self.websocket.headers.get(
+                "authorization", ""
+            ).partition(" ")
+            if scheme.lower() != "bearer":
+                token = ""
+        if not token:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+        return token
+
+    def _owned_session(self, db, session_id: str) -> UUID:
+        try:
+            session_id = UUID(session_id)
+        except ValueError:
+            raise HTTPException(status_code=404, detail="Session not found")
+        owner_id = (
+            db.query(ChatSession.user_id)
+            .filter(ChatSession.session_id == session_id)
+            .scalar()
+        )
+        if owner_id is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        if owner_id != self.user.id:
+            raise HTTPException(status_code=403, detail="Not authorized")
+        return session_id
+
+    async def _dispatch(self, text: str) -> bool:
+        """Handle one client frame; False once the connection has been closed"""
+        if self._expires_at is not None and time.time() >= self._expires_at:
+            ws_messages.inc(outcome="token_expired")
+            await self.websocket.close(code=4401, reason="Token expired")
+            return False
+
+        try:
+            frame = json.loads(text)
+            if not isinstance(frame, dict):
+                raise ValueError
+        except ValueError:
+            await self._send_error(400, "Frames must be JSON objects")
+            return True
+
+        if frame.get("type") == "ping":
+            await self._send({"type": "pong"})
+            return True
+        if self._turn is not None and not self._turn.done():
+            await self._send_error(409, "Still answering the previous message")
+            return True
+
+        try:
+            request = ChatRequest(**frame)
+        except ValidationError as e:
+            await self._send_error(422, [error["msg"] for error in e.errors()])
+            return True
+        if not hit_chat_rate_limit(self.user):
+            await self._send_error(429, "Rate limit exceeded")
+            return True
+
+        self._turn = asyncio.create_task(self._answer(request))
+        return True
+
+    async def _answer(self, request: ChatRequest):
+        """Send the answer as soon as it exists, then push its follow-ups"""
+        chat_data = ChatMessageCreate(
+            user_id=self.user.id,
+            message=request.message,
+            session_id=self.session_id,
+            model=request.model,
+            temperature=request.temperature,
+            active_pdf_type=request.active_pdf_type or "default",
+        )
+        db = SessionLocal()
+        try:
+            chat_service = ChatService(db)
+            response = await chat_service.handle_chat(
+                chat_data, memory_handler=self.memory_handler, defer_followups=True
+            )
+            self.session_id = response.session_id
+            await self._send({"type": "answer", **response.model_dump(mode="json")})
+            ws_messages.inc(outcome="answered")
+            # The next question may arrive while follow-ups are still generated
+            self._followups = asyncio.create_task(
+                self._push_followups(chat_service, response.session_id)
+            )
+        except HTTPException as e:
+            ws_messages.inc(outcome=f"http_{e.status_code}")
+            await self._send_error(e.status_code, e.detail)
+        except Exception as e:
+            print("❌ WebSocket chat message failed:", e)
+            ws_messages.inc(outcome="error")
+            await self._send_error(500, "Internal server error")
+        finally:
+            db.close()
+
+    async def _push_followups(self, chat_service: ChatService, session_id: UUID):
+        try:
+            followups = await chat_service.deferred_followups()
+        except Exception as e:
+            print("⚠️ WebSocket follow-up generation failed:", e)
+            return
+        if followups:
+            await self._send(
+                {
+                    "type": "followups",
+                    "session_id": str(session_id),
+                    "ai_followups": followups,
+                }
+            )
+
+    async def _send_error(self, status_code: int, detail):
+        await self._send({"type": "error", "status": status_code, "detail": detail})
+
+    async def _send(self, frame: dict):
+        try:
+            await self.websocket.send_json(frame)
+        except (WebSocketDisconnect, RuntimeError):
+            # Client already gone; serve() cancels whatever is still running
+            pass
+
+
+def _str(value) -> str | None:
+    return None if value is None else str(value)
+
+
+registry.gauge(
+    "campusbot_ws_connections",
+    "Open chat WebSocket connections",
+    lambda: ChatSocket.open_connections,
+)
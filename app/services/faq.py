@@ -0,0 +1,85 @@
+import os
+import threading
+
+from dotenv import load_dotenv
+
+from app.utils.intent_matcher import intent_matcher
+from app.utils.metrics import cache_requests
+
+load_dotenv()
+
+# Share of the question that matched phrases must cover to skip the LLM
+FAQ_MIN_COVERAGE = float(os.getenv("FAQ_MIN_COVERAGE", 0.6))
+FAQ_FAST_PATH_ENABLED = os.getenv("FAQ_FAST_PATH_ENABLED", "true").lower() == "true"
+# Fall back to embedding similarity for paraphrases keywords don't catch
+SEMANTIC_ROUTER_ENABLED = (
+    os.getenv("SEMANTIC_ROUTER_ENABLED", "false").lower() == "true"
+)
+
+
+class FaqStats:
+    """Counters showing how much /chat traffic the FAQ fast-path absorbs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.hits_by_intent = {}
+
+    def record(self, button: dict | None):
+        with self._lock:
+            result = "miss" if button is None else "hit"
+            cache_requests.inc(cache="faq", result=result)
+            if button is None:
+                self.misses += 1
+                return
+            self.hits += 1
+            intent = button.get("intent_type") or "unknown"
+            self.hits_by_intent[intent] = self.hits_by_intent.get(intent, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "hits_by_intent": dict(self.hits_by_intent),
+            }
+
+
+faq_stats = FaqStats()
+
+
+def _is_answerable(button: dict) -> bool:
+    return button.get("response_type") == "rule" and bool(button.get("answer_text"))
+
+
+async def find_faq_answer(message: str) -> dict | None:
+    """Return the quick button whose canned answer confidently answers the message"""
+    if not FAQ_FAST_PATH_ENABLED:
+        return None
+
+    button = None
+    match = intent_matcher.match(message)
+    if (
+        match
+        and not match["ambiguous"]
+        and match["coverage"] >= FAQ_MIN_COVERAGE
+        and _is_answerable(match["button"])
+    ):
+        button = match["button"]
+
+    if button is None and SEMANTIC_ROUTER_ENABLED:
+        from app.utils.semantic_router import semantic_router
+
+        try:
+            routed = await semantic_router.classify_async(message)
+        except Exception as e:
+            print("⚠️ Semantic router failed:", e)
+            routed = None
+        if routed and _is_answerable(routed["button"]):
+            button = routed["button"]
+
+    faq_stats.record(button)
+    return button
@@ -1,158 +1,552 @@
+import asyncio
 import os
 import json
-from functools import lru_cache
+import re
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
 
+import httpx
+from fastapi import HTTPException
+
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
 from langchain_core.globals import set_llm_cache
 from langchain_core.caches import InMemoryCache
 from langchain_core.messages import HumanMessage, AIMessage
 
+from app.config import LLM_ALLOWED_MODELS, LLM_DEFAULT_MODEL, corpus_version
 from app.schemas import ResponseFormatter
+from app.services.llm_resilience import LLM_MAX_RETRIES, LLM_REQUEST_TIMEOUT, upstream
+from app.services.llm_scheduler import llm_scheduler
+from app.services.model_router import route_configurations
+from app.services.prompt_template import PromptTemplateService
+from app.services.usage_ledger import usage_ledger
+from app.utils.deadline import remaining, within_deadline
+from app.utils.keyword_automaton import normalize_text
+from app.utils.metrics import (
+    cache_requests,
+    openai_tokens,
+    prompt_cache_ratio,
+    registry,
+    trace_stage,
+)
+from app.utils.single_flight import SINGLE_FLIGHT_ENABLED, SingleFlight
 
 load_dotenv()
 set_llm_cache(InMemoryCache())
 
+LLM_DEFAULT_TEMPERATURE = float(os.getenv("LLM_DEFAULT_TEMPERATURE", 0.3))
+LLM_FOLLOWUP_MODEL = os.getenv("LLM_FOLLOWUP_MODEL", "gpt-4o-mini")
+# Below this much time left in the request, follow-up generation is skipped
+LLM_FOLLOWUP_MIN_TIME = float(os.getenv("LLM_FOLLOWUP_MIN_TIME", 3))
+LLM_HANDLER_POOL_SIZE = int(os.getenv("LLM_HANDLER_POOL_SIZE", 8))
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", 50))
+
+# Shared by every handler; keys include the model configuration
+llm_single_flight = SingleFlight("llm")
+
+# Served when a structured answer hits max_tokens before any answer text
+TRUNCATED_ANSWER = (
+    "Sorry, my answer was cut short. Could you ask about one part of it at a time?"
+)
+# Opening of the "answer" string in partial structured-output JSON
+_ANSWER_FIELD = re.compile(r'"answer"\s*:\s*"((?:[^"\\]|\\.)*)')
+
+truncated_answers = registry.counter(
+    "campusbot_llm_truncated_answers_total",
+    "Structured answers cut off at max_tokens and served partially",
+)
+
 
 class LLMHandler:
-    def __init__(self, model: str = "openai", temperature: float = 0.2):
+    def __init__(
+        self,
+        model: str = LLM_DEFAULT_MODEL,
+        temperature: float = LLM_DEFAULT_TEMPERATURE,
+        max_tokens: int | None = None,
+        http_client=None,
+        http_async_client=None,
+    ):
         self.model_name = model
         self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.http_client = http_client
+        self.http_async_client = http_async_client
         self.llm = self._load_model()
         self.llm_with_tools = self._load_model_with_tools()
+        self.followup_chain = self._load_followup_chain()
         self._followup_cache = {}
 
+    def _chat_model(self, **kwargs) -> ChatOpenAI:
+        kwargs.setdefault("request_timeout", LLM_REQUEST_TIMEOUT)
+        return ChatOpenAI(
+            openai_api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=self.http_client,
+            http_async_client=self.http_async_client,
+            max_retries=LLM_MAX_RETRIES,
+            **kwargs,
+        )
+
     def _load_model(self):
         """Load structured output model for regular responses"""
-        if self.model_name == "openai":
-            base = ChatOpenAI(
-                model="gpt-4o-mini",
-                temperature=self.temperature,
-                openai_api_key=os.getenv("OPENAI_API_KEY"),
-             
-            )
-            return base.with_structured_output(ResponseFormatter)
-        raise ValueError(f"Unsupported model: {self.model_name}")
+        base = self._chat_model(
+            model=self.model_name,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+        )
+        # include_raw keeps the AIMessage so token usage can be read
+        return base.with_structured_output(ResponseFormatter, include_raw=True)
 
     def _load_model_with_tools(self):
         """Load model with web search tools"""
-        if self.model_name == "openai":
-            llm = ChatOpenAI(
-                model="gpt-4o-mini",
-                temperature=self.temperature,
-                openai_api_key=os.getenv("OPENAI_API_KEY"),
-            )
-            tool = {"type": "web_search_preview"}
-            return llm.bind_tools([tool])
-        return None
+        llm = self._chat_model(
+            model=self.model_name,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+        )
+        tool = {"type": "web_search_preview"}
+        return llm.bind_tools([tool])
+
+    def _load_followup_chain(self):
+        """Follow-ups always use the small model; built once, not per request"""
+        base_model = self._chat_model(
+            model=LLM_FOLLOWUP_MODEL,
+            temperature=0.3,
+            max_tokens=150,
+            request_timeout=15,
+        )
+        # Runnable rather than LLMChain, so the AIMessage (and its usage) is kept
+        return PromptTemplateService.get_followup_prompt() | base_model
 
     def get_response(
-        self, memory_handler, message: str, use_web_search: bool = False
+        self,
+        memory_handler,
+        message: str,
+        use_web_search: bool = False,
+        history_limit: int = 10,
     ) -> dict:
         """Returns structured response with answer and followup."""
         try:
-            # Add user message to memory
-            memory_handler.add_message(HumanMessage(content=message))
-            history = memory_handler.get_recent_messages(limit=10)
-
-            if self.model_name == "openai":
-                if use_web_search and self.llm_with_tools:
-                    # Web search response
-                    search_response = self.llm_with_tools.invoke(history)
-                    answer_text = search_response.content or "Web search completed"
-                    followup_text = (
-                        "Would you like me to search for more specific information?"
-                    )
-                else:
-                    # Structured output response
-                    structured_response = self.llm.invoke(history)
-                    answer_text = structured_response.answer
-                    followup_text = structured_response.followup_question
-
-                # Store AI response in memory
-                memory_handler.add_message(AIMessage(content=answer_text))
-
-                # Generate follow-up questions (moved to separate method)
-                ai_followups = self._get_cached_followups(message, answer_text)
-
-                return {
-                    "answer": answer_text,
-                    "followup_question": followup_text,
-                    "ai_followups": ai_followups,
-                    "success": True,
-                    "used_web_search": use_web_search,
-                }
-
+            history = self._load_history(memory_handler, message, history_limit)
+            response = self._generate(history, message, use_web_search)
+            # Store AI response in memory
+            memory_handler.add_message(AIMessage(content=response["answer"]))
+            return response
         except Exception as e:
-            return {
-                "answer": f"Error generating response: {str(e)}",
-                "followup_question": None,
-                "ai_followups": [],
-                "success": False,
-                "used_web_search": False,
-            }
+            return _error_response(e)
+
+    async def aget_response(
+        self,
+        memory_handler,
+        message: str,
+        use_web_search: bool = False,
+        history_limit: int = 10,
+        tier: str = "basic",
+        progress: dict | None = None,
+        include_followups: bool = True,
+    ) -> dict:
+        """
+        Async get_response; cancelling it aborts the in-flight OpenAI requests.
+
+        Upstream calls go through the LLM scheduler, which may reject them
+        with a 503 under load, and must finish within the request deadline
+        (504 otherwise). Context-free questions (no earlier turns in memory)
+        that are identical after normalization share one in-flight upstream
+        call; waiters get the same answer with zero usage, since they
+        consumed no tokens. `progress` receives the answer and usage as soon
+        as the completion is done, so a cancelled caller can still keep them.
+        Callers that push follow-ups separately pass include_followups=False
+        and call aget_cached_followups once the answer is out.
+        """
+
+        async def generate():
+            async with llm_scheduler.slot(tier):
+                return await self._agenerate(
+                    history, message, use_web_search, progress, include_followups
+                )
 
-    def generate_followups(self, user_input: str, bot_answer: str) -> list[str]:
-        """Generate follow-up questions using external prompt"""
         try:
-            # Import here to avoid circular imports
-            from app.services.prompt_template import PromptTemplateService
-
-            base_model = ChatOpenAI(
-                model="gpt-4o-mini",
-                temperature=0.3,
-                openai_api_key=os.getenv("OPENAI_API_KEY"),
-                max_tokens=150,
-                request_timeout=15,
+            history = self._load_history(memory_handler, message, history_limit)
+            if SINGLE_FLIGHT_ENABLED and not use_web_search and len(history) == 1:
+                response, shared = await within_deadline(
+                    llm_single_flight.do(
+                        self._coalescing_key(message, include_followups), generate
+                    ),
+                    "llm",
+                )
+                if shared:
+                    response = {
+                        **response,
+                        "usage": _usage_from_message(None),
+                        "coalesced": True,
+                    }
+            else:
+                response = await within_deadline(generate(), "llm")
+            memory_handler.add_message(AIMessage(content=response["answer"]))
+            return response
+        except HTTPException:
+            raise
+        except Exception as e:
+            return _error_response(e)
+
+    def _load_history(self, memory_handler, message: str, limit: int) -> list:
+        # Add user message to memory
+        memory_handler.add_message(HumanMessage(content=message))
+        return memory_handler.get_recent_messages(limit=limit)
+
+    def _coalescing_key(self, message: str, include_followups: bool) -> str:
+        return ":".join(
+            (
+                self.model_name,
+                str(self.temperature),
+                str(self.max_tokens),
+                "followups" if include_followups else "answer",
+                corpus_version(),
+                normalize_text(message),
             )
+        )
 
-            # Use prompt from PromptTemplateService
-            followup_prompt = PromptTemplateService.get_followup_prompt()
-            chain = LLMChain(prompt=followup_prompt, llm=base_model)
+    def _generate(self, history: list, message: str, use_web_search: bool) -> dict:
+        """The upstream part of a response: OpenAI completion plus follow-ups"""
+        answer_text, followup_text, usage = self._complete(history, use_web_search)
 
-            result = chain.invoke(
-                {"question": user_input[:200], "answer": bot_answer[:300]}
+        # Generate follow-up questions (moved to separate method)
+        with trace_stage("llm.followups"):
+            ai_followups = self._get_cached_followups(message, answer_text)
+
+        return _response(
+            answer_text, followup_text, ai_followups, use_web_search, usage
+        )
+
+    async def _agenerate(
+        self,
+        history: list,
+        message: str,
+        use_web_search: bool,
+        progress: dict | None = None,
+        include_followups: bool = True,
+    ) -> dict:
+        """_generate for the async path: breaker, hedging and deadline-aware"""
+        answer_text, followup_text, usage = await upstream.call(
+            lambda: self._acomplete(history, use_web_search),
+            kind="web_search" if use_web_search else "chat",
+            hedge=not use_web_search,
+        )
+        if progress is not None:
+            progress.update(
+                answer=answer_text, followup_question=followup_text, usage=usage
             )
 
-            raw = result.get("text", "") if isinstance(result, dict) else str(result)
-            lines = raw.strip().split("\n")
+        # Follow-ups are optional; skip them rather than blow the deadline
+        time_left = remaining()
+        if not include_followups or (
+            time_left is not None and time_left < LLM_FOLLOWUP_MIN_TIME
+        ):
+            ai_followups = []
+        else:
+            with trace_stage("llm.followups"):
+                ai_followups = await self.aget_cached_followups(message, answer_text)
+
+        return _response(
+            answer_text, followup_text, ai_followups, use_web_search, usage
+        )
+
+    def _complete(self, history: list, use_web_search: bool) -> tuple[str, str, dict]:
+        """One OpenAI call: (answer, follow-up question, usage)"""
+        if use_web_search and self.llm_with_tools:
+            # Web search response
+            with trace_stage("llm.web_search"):
+                search_response = self.llm_with_tools.invoke(history)
+            answer_text = search_response.content or "Web search completed"
+            followup_text = "Would you like me to search for more specific information?"
+            usage = _usage_from_message(search_response)
+        else:
+            # Structured output response
+            with trace_stage("llm.completion"):
+                result = self.llm.invoke(history)
+            answer_text, followup_text = _structured_answer(result)
+            usage = _usage_from_message(result["raw"])
 
-            followups = []
-            for line in lines:
-                line = line.strip()
-                if line and any(c.isalpha() for c in line):
-                    question = line.lstrip("1234567890.:- ").strip()
-                    if question and len(question) > 5:
-                        followups.append(question)
+        self._record_usage(usage, "web_search" if use_web_search else "chat")
+        return answer_text, followup_text, usage
 
-            return followups[:3]
+    async def _acomplete(
+        self, history: list, use_web_search: bool
+    ) -> tuple[str, str, dict]:
+        """_complete over the async client, so cancelling aborts the request"""
+        if use_web_search and self.llm_with_tools:
+            with trace_stage("llm.web_search"):
+                search_response = await self.llm_with_tools.ainvoke(history)
+            answer_text = search_response.content or "Web search completed"
+            followup_text = "Would you like me to search for more specific information?"
+            usage = _usage_from_message(search_response)
+        else:
+            with trace_stage("llm.completion"):
+                result = await self.llm.ainvoke(history)
+            answer_text, followup_text = _structured_answer(result)
+            usage = _usage_from_message(result["raw"])
+
+        self._record_usage(usage, "web_search" if use_web_search else "chat")
+        return answer_text, followup_text, usage
+
+    def generate_followups(self, user_input: str, bot_answer: str) -> list[str]:
+        """Generate follow-up questions using external prompt"""
+        try:
+            result = self.followup_chain.invoke(
+                {"question": user_input[:200], "answer": bot_answer[:300]}
+            )
+            self._record_usage(
+                _usage_from_message(result), "followups", LLM_FOLLOWUP_MODEL
+            )
+            return _parse_followups(result)
+        except Exception:
+            return list(DEFAULT_FOLLOWUPS)
 
+    async def agenerate_followups(self, user_input: str, bot_answer: str) -> list[str]:
+        """generate_followups over the async client (cancellable)"""
+        try:
+            result = await self.followup_chain.ainvoke(
+                {"question": user_input[:200], "answer": bot_answer[:300]}
+            )
+            self._record_usage(
+                _usage_from_message(result), "followups", LLM_FOLLOWUP_MODEL
+            )
+            return _parse_followups(result)
         except Exception:
-            return [
-                "Can you tell me more about this?",
-                "What are the main benefits?",
-                "Are there any alternatives?",
-            ]
+            return list(DEFAULT_FOLLOWUPS)
+
+    def _record_usage(self, usage: dict, call: str, model: str | None = None):
+        """Export OpenAI token counts as metrics and add them to the ledger"""
+        model = model or self.model_name
+        usage_ledger.record(model, call, usage)
+        for kind, count in (
+            ("prompt", usage["input_tokens"]),
+            ("prompt_cached", usage["cached_input_tokens"]),
+            ("completion", usage["output_tokens"]),
+        ):
+            openai_tokens.inc(count, model=model, call=call, kind=kind)
+        if usage["input_tokens"]:
+            prompt_cache_ratio.observe(
+                usage["cached_input_tokens"] / usage["input_tokens"],
+                model=model,
+                call=call,
+            )
 
     def _get_cached_followups(self, user_input: str, bot_answer: str) -> list[str]:
         """Get cached follow-up questions or generate new ones"""
         cache_key = f"{hash(user_input)}_{hash(bot_answer[:100])}"
 
         if cache_key in self._followup_cache:
+            cache_requests.inc(cache="followups", result="hit")
             return self._followup_cache[cache_key]
+        cache_requests.inc(cache="followups", result="miss")
 
         followups = self.generate_followups(user_input, bot_answer)
+        self._cache_followups(cache_key, followups)
+        return followups
+
+    async def aget_cached_followups(
+        self, user_input: str, bot_answer: str
+    ) -> list[str]:
+        """Follow-ups for an answer, from the in-process cache when possible"""
+        cache_key = f"{hash(user_input)}_{hash(bot_answer[:100])}"
+
+        if cache_key in self._followup_cache:
+            cache_requests.inc(cache="followups", result="hit")
+            return self._followup_cache[cache_key]
+        cache_requests.inc(cache="followups", result="miss")
+
+        followups = await self.agenerate_followups(user_input, bot_answer)
+        self._cache_followups(cache_key, followups)
+        return followups
+
+    def _cache_followups(self, cache_key: str, followups: list[str]):
         self._followup_cache[cache_key] = followups
 
         # Keep cache manageable
         if len(self._followup_cache) > 100:
             self._followup_cache.clear()
 
-        return followups
+
+DEFAULT_FOLLOWUPS = (
+    "Can you tell me more about this?",
+    "What are the main benefits?",
+    "Are there any alternatives?",
+)
+
+
+def _parse_followups(result) -> list[str]:
+    """Up to three questions from the numbered list the follow-up chain returns"""
+    raw = getattr(result, "content", None)
+    if raw is None:
+        raw = result.get("text", "") if isinstance(result, dict) else str(result)
+    lines = raw.strip().split("\n")
+
+    followups = []
+    for line in lines:
+        line = line.strip()
+        if line and any(c.isalpha() for c in line):
+            question = line.lstrip("1234567890.:- ").strip()
+            if question and len(question) > 5:
+                followups.append(question)
+
+    return followups[:3]
+
+
+def _structured_answer(result: dict) -> tuple[str, str | None]:
+    """(answer, follow-up question) from a with_structured_output result"""
+    structured_response = result["parsed"]
+    if structured_response is not None:
+        return structured_response.answer, structured_response.followup_question
+
+    raw = result["raw"]
+    metadata = getattr(raw, "response_metadata", None) or {}
+    if metadata.get("finish_reason") != "length":
+        raise ValueError(f"Unparseable response: {result['parsing_error']}")
+
+    # Hit max_tokens mid-JSON: a degraded answer, not an upstream failure
+    truncated_answers.inc()
+    text = raw.content if isinstance(raw.content, str) else ""
+    for call in getattr(raw, "invalid_tool_calls", None) or []:
+        text = text or call.get("args") or ""
+    match = _ANSWER_FIELD.search(text)
+    if not match:
+        return TRUNCATED_ANSWER, None
+    # Drop a dangling escape, then unescape what was written
+    partial = match.group(1).rstrip("\\")
+    try:
+        partial = json.loads(f'"{partial}"')
+    except ValueError:
+        pass
+    partial = partial.strip()
+    return (partial + " …" if partial else TRUNCATED_ANSWER), None
+
+
+def _response(
+    answer_text: str,
+    followup_text: str,
+    ai_followups: list[str],
+    used_web_search: bool,
+    usage: dict,
+) -> dict:
+    return {
+        "answer": answer_text,
+        "followup_question": followup_text,
+        "ai_followups": ai_followups,
+        "success": True,
+        "used_web_search": used_web_search,
+        "usage": usage,
+    }
+
+
+def _error_response(error: Exception) -> dict:
+    return {
+        "answer": f"Error generating response: {str(error)}",
+        "followup_question": None,
+        "ai_followups": [],
+        "success": False,
+        "used_web_search": False,
+        "usage": _usage_from_message(None),
+    }
+
+
+def _usage_from_message(message) -> dict:
+    """Prompt/completion token counts reported by OpenAI for one response"""
+    usage = getattr(message, "usage_metadata", None) or {}
+    # Prompt tokens served from OpenAI's prompt cache (billed at a discount)
+    details = usage.get("input_token_details") or {}
+    return {
+        "input_tokens": usage.get("input_tokens", 0),
+        "cached_input_tokens": details.get("cache_read") or 0,
+        "output_tokens": usage.get("output_tokens", 0),
+        "total_tokens": usage.get("total_tokens", 0),
+    }
+
+
+class LLMHandlerRegistry:
+    """
+    Bounded pool of pre-built LLMHandlers, one per (model, temperature,
+    max_tokens).
+
+    Only models in LLM_ALLOWED_MODELS are served and temperatures are
+    rounded to one decimal, so clients can't grow the pool without bound;
+    beyond `max_size` configurations the least recently used is dropped.
+    All handlers share one sync and one async HTTP connection pool to the
+    OpenAI API.
+    """
+
+    def __init__(
+        self,
+        allowed_models: list[str] = LLM_ALLOWED_MODELS,
+        max_size: int = LLM_HANDLER_POOL_SIZE,
+    ):
+        self.allowed_models = allowed_models
+        self.max_size = max_size
+        self._handlers = OrderedDict()
+        self._lock = threading.Lock()
+        self._http_clients = None
+
+    def get(
+        self,
+        model: str | None = None,
+        temperature: float | None = None,
+        max_tokens: int | None = None,
+    ):
+        """Handler for a model configuration, building it on first use"""
+        model = model or LLM_DEFAULT_MODEL
+        if model not in self.allowed_models:
+            raise HTTPException(status_code=400, detail=f"Unsupported model: {model}")
+        if temperature is None:
+            temperature = LLM_DEFAULT_TEMPERATURE
+        key = (model, round(temperature, 1), max_tokens)
+
+        with self._lock:
+            handler = self._handlers.get(key)
+            if handler is not None:
+                self._handlers.move_to_end(key)
+                cache_requests.inc(cache="llm_handler", result="hit")
+                return handler
+
+            cache_requests.inc(cache="llm_handler", result="miss")
+            http_client, http_async_client = self._get_http_clients()
+            handler = LLMHandler(
+                *key, http_client=http_client, http_async_client=http_async_client
+            )
+            self._handlers[key] = handler
+            while len(self._handlers) > self.max_size:
+                self._handlers.popitem(last=False)
+            return handler
+
+    def prebuild(self):
+        """Build every allowed model's default and each chat route's config"""
+        for model in self.allowed_models:
+            self.get(model)
+        # Keys include max_tokens, so routed chats need their own handlers;
+        # built last so they are the most recently used in the pool
+        for model, max_tokens in route_configurations():
+            self.get(model, max_tokens=max_tokens)
+
+    def configurations(self) -> list[tuple]:
+        with self._lock:
+            return list(self._handlers)
+
+    def _get_http_clients(self) -> tuple[httpx.Client, httpx.AsyncClient]:
+        if self._http_clients is None:
+            limits = httpx.Limits(
+                max_connections=LLM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_HTTP_MAX_CONNECTIONS,
+            )
+            self._http_clients = (
+                httpx.Client(limits=limits),
+                httpx.AsyncClient(limits=limits),
+            )
+        return self._http_clients
+
+
+llm_registry = LLMHandlerRegistry()
 
 
-@lru_cache(maxsize=1)
 def get_llm_handler() -> LLMHandler:
-    return LLMHandler(model="openai", temperature=0.3)
+    """Handler for the default model and temperature"""
+    return llm_registry.get()
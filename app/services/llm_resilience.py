@@ -0,0 +1,267 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from openai import APIConnectionError, APIStatusError
+
+from app.services.llm_scheduler import llm_scheduler
+from app.utils.deadline import remaining
+from app.utils.metrics import registry
+
+load_dotenv()
+
+# Hard timeout for one OpenAI HTTP request
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", 30))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 1))
+# Hedging: start a duplicate call once the first is slower than recent p95
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", 1.0))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20))
+# Upper bound on hedged calls as a share of all calls (each one costs tokens)
+LLM_HEDGE_MAX_RATIO = float(os.getenv("LLM_HEDGE_MAX_RATIO", 0.1))
+# Circuit breaker: open after this many consecutive failures, for this long
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", 5))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", 30))
+
+upstream_latency = registry.histogram(
+    "campusbot_openai_call_seconds", "OpenAI call latency by call type and outcome"
+)
+upstream_events = registry.counter(
+    "campusbot_openai_resilience_total",
+    "Hedged calls, skipped hedges, hedge wins, breaker rejections and trips",
+)
+
+
+def is_provider_failure(error: Exception) -> bool:
+    """
+    True for errors that mean the provider is unreachable or degraded.
+
+    Only these feed the breaker: connection failures and timeouts, rate
+    limiting (429) and 5xx responses. A reply we can't parse or validate,
+    or a 4xx for a bad request, shows the provider is up.
+    """
+    if isinstance(error, (APIConnectionError, httpx.TransportError, TimeoutError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+class LatencyTracker:
+    """Recent successful call latencies, for percentiles and the hedge delay"""
+
+    def __init__(self, size: int = 500):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class CircuitBreaker:
+    """
+    Fails fast while the provider is degraded.
+
+    Opens after `failure_threshold` consecutive failures; while open every
+    call is rejected with a 503 until `cooldown` has passed, then a single
+    probe call is let through (half-open) and its outcome closes or
+    re-opens the breaker.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = LLM_BREAKER_FAILURES,
+        cooldown: float = LLM_BREAKER_COOLDOWN,
+    ):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == "closed":
+                return
+            retry_after = self._opened_at + self.cooldown - time.monotonic()
+            if self.state == "open" and retry_after <= 0:
+                self.state = "half_open"
+                return
+            upstream_events.inc(event="breaker_rejected")
+            raise HTTPException(
+                status_code=503,
+                detail="The AI provider is unavailable, please retry shortly",
+                headers={"Retry-After": str(max(1, int(retry_after) + 1))},
+            )
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def abandon_probe(self):
+        """A half-open probe was cancelled before an outcome; allow a new one"""
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "open"
+                self._opened_at = time.monotonic() - self.cooldown
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    upstream_events.inc(event="breaker_opened")
+                    print(f"⚠️ OpenAI circuit breaker open for {self.cooldown}s")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+class ResilientCaller:
+    """Runs async OpenAI calls with breaker, deadline-aware hedging and stats"""
+
+    def __init__(self, breaker: CircuitBreaker, latencies: LatencyTracker):
+        self.breaker = breaker
+        self.latencies = latencies
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    async def call(self, fn, kind: str, hedge: bool = False):
+        """Await `fn()`, maybe hedged; provider failures feed the breaker"""
+        self.breaker.before_call()
+        self.calls += 1
+        started_at = time.perf_counter()
+        try:
+            hedge_delay = self._hedge_delay() if hedge else None
+            if hedge_delay is not None:
+                result = await self._hedged(fn, hedge_delay)
+            else:
+                result = await fn()
+        except asyncio.CancelledError:
+            # Out of time (deadline) or the client went away: not the provider's fault
+            self.breaker.abandon_probe()
+            upstream_latency.observe(
+                time.perf_counter() - started_at, kind=kind, outcome="cancelled"
+            )
+            raise
+        except Exception as e:
+            if is_provider_failure(e):
+                self.breaker.record_failure()
+            else:
+                # The provider answered; the failure is ours to handle
+                self.breaker.record_success()
+            upstream_latency.observe(
+                time.perf_counter() - started_at, kind=kind, outcome="error"
+            )
+            raise
+
+        elapsed = time.perf_counter() - started_at
+        self.breaker.record_success()
+        self.latencies.observe(elapsed)
+        upstream_latency.observe(elapsed, kind=kind, outcome="ok")
+        return result
+
+    def snapshot(self) -> dict:
+        return {
+            "breaker": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_delay_ms": _ms(self._hedge_delay()),
+            "latency_ms": {
+                f"p{pct}": _ms(self.latencies.percentile(pct)) for pct in (50, 95, 99)
+            },
+            "samples": len(self.latencies),
+        }
+
+    # === Internal Helpers ===
+
+    def _hedge_delay(self) -> float | None:
+        if not LLM_HEDGING_ENABLED or len(self.latencies) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        if self.hedges >= LLM_HEDGE_MAX_RATIO * self.calls:
+            return None
+        delay = max(LLM_HEDGE_MIN_DELAY, self.latencies.percentile(95))
+        time_left = remaining()
+        # Not worth a second call that couldn't finish before the deadline
+        if time_left is not None and time_left < delay * 2:
+            return None
+        return delay
+
+    async def _hedged(self, fn, delay: float):
+        first = asyncio.ensure_future(fn())
+        attempts = [first]
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if done:
+                return first.result()
+
+            # The duplicate needs its own scheduler slot; don't add load the
+            # scheduler would otherwise have queued or shed
+            if not llm_scheduler.try_acquire():
+                upstream_events.inc(event="hedge_skipped")
+                return await first
+
+            self.hedges += 1
+            upstream_events.inc(event="hedged")
+            second = asyncio.ensure_future(fn())
+            # Runs even if the attempt is cancelled before it starts
+            second.add_done_callback(lambda _: llm_scheduler.release())
+            attempts.append(second)
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for attempt in done:
+                    if attempt.exception() is None:
+                        if attempt is second:
+                            self.hedge_wins += 1
+                            upstream_events.inc(event="hedge_won")
+                        return attempt.result()
+            # Both attempts failed; surface the original call's error
+            return first.result()
+        finally:
+            for attempt in attempts:
+                # Cancelling closes the losing (or abandoned) HTTP request
+                attempt.cancel()
+
+
+def _ms(seconds: float | None) -> float | None:
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+upstream = ResilientCaller(CircuitBreaker(), LatencyTracker())
+
+registry.gauge(
+    "campusbot_openai_latency_quantile_seconds",
+    "Recent successful OpenAI call latency percentiles",
+    lambda: {
+        (("quantile", str(pct / 100)),): upstream.latencies.percentile(pct) or 0
+        for pct in (50, 95, 99)
+    },
+)
+registry.gauge(
+    "campusbot_openai_breaker_open",
+    "1 while the OpenAI circuit breaker is open or half-open",
+    lambda: int(upstream.breaker.state != "closed"),
+)
@@ -0,0 +1,169 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+from app.utils.metrics import registry
+
+load_dotenv()
+
+# Concurrent upstream OpenAI calls allowed per worker process
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+# Requests allowed to wait for a slot; beyond this they are shed with a 503
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", 64))
+# Longest a request waits in the queue before giving up with a 503
+LLM_MAX_QUEUE_WAIT = float(os.getenv("LLM_MAX_QUEUE_WAIT", 20))
+
+# Lower runs first; premium students and admins are served before basic users,
+# and bulk batch questions only run behind all interactive traffic
+PRIORITIES = {"admin": 0, "premium": 1, "basic": 2, "batch": 3}
+
+
+class LLMScheduler:
+    """
+    Admission control for upstream LLM calls.
+
+    At most `max_concurrency` calls run at once. Others wait in a priority
+    queue (by user tier, FIFO within a tier) of at most `max_queue` entries.
+    When the queue is full, a request from a higher tier evicts the newest
+    waiter of the lowest tier; otherwise the newcomer is rejected. Shed
+    requests get a 503 with a Retry-After estimated from recent call times.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_queue: int = LLM_MAX_QUEUE,
+        max_wait: float = LLM_MAX_QUEUE_WAIT,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        # (priority, sequence, future); cancelled entries are skipped lazily
+        self._queue = []
+        self._sequence = itertools.count()
+        # Moving average of how long a slot is held, for Retry-After
+        self._avg_call_seconds = 2.0
+
+    @asynccontextmanager
+    async def slot(self, tier: str = "basic"):
+        """Hold one upstream-call slot for the duration of the block"""
+        priority = PRIORITIES.get(tier, PRIORITIES["basic"])
+        queued_at = time.perf_counter()
+        await self._acquire(priority, tier)
+        started_at = time.perf_counter()
+        llm_queue_wait.observe(started_at - queued_at, tier=tier)
+        try:
+            yield
+        finally:
+            held = time.perf_counter() - started_at
+            self._avg_call_seconds = 0.9 * self._avg_call_seconds + 0.1 * held
+            self._release()
+
+    def try_acquire(self) -> bool:
+        """Take a free slot without queueing; pair a True with release()"""
+        if self.active < self.max_concurrency and not self._waiting():
+            self.active += 1
+            return True
+        return False
+
+    def release(self):
+        self._release()
+
+    def queue_depth(self) -> dict:
+        depth = {tier: 0 for tier in PRIORITIES}
+        tiers = {priority: tier for tier, priority in PRIORITIES.items()}
+        for priority, _, future in list(self._queue):
+            if not future.done():
+                depth[tiers[priority]] += 1
+        return {(("tier", tier),): count for tier, count in depth.items()}
+
+    # === Internal Helpers ===
+
+    async def _acquire(self, priority: int, tier: str):
+        if self.active < self.max_concurrency and not self._waiting():
+            self.active += 1
+            return
+
+        if self._waiting() >= self.max_queue:
+            self._shed_for(priority, tier)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._sequence), future))
+        try:
+            # The slot is handed over by _release, already counted in `active`
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except asyncio.TimeoutError:
+            self._abandon(future)
+            llm_shed.inc(tier=tier, reason="queue_timeout")
+            raise self._overloaded()
+        except asyncio.CancelledError:
+            self._abandon(future)
+            raise
+
+    def _release(self):
+        while self._queue:
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def _abandon(self, future: asyncio.Future):
+        if future.done() and not future.cancelled() and future.exception() is None:
+            # Granted a slot just as we gave up; pass it on
+            self._release()
+        else:
+            future.cancel()
+
+    def _shed_for(self, priority: int, tier: str):
+        """Make room for a newcomer by evicting a lower-tier waiter, or reject it"""
+        waiting = [entry for entry in self._queue if not entry[2].done()]
+        victim = max(waiting, key=lambda entry: entry[:2], default=None)
+        if victim is None or victim[0] <= priority:
+            llm_shed.inc(tier=tier, reason="queue_full")
+            raise self._overloaded()
+        victim_tier = next(t for t, p in PRIORITIES.items() if p == victim[0])
+        llm_shed.inc(tier=victim_tier, reason="preempted")
+        victim[2].set_exception(self._overloaded())
+
+    def _waiting(self) -> int:
+        return sum(1 for _, _, future in self._queue if not future.done())
+
+    def _overloaded(self) -> HTTPException:
+        backlog = self._waiting() + 1
+        retry_after = math.ceil(
+            self._avg_call_seconds * backlog / max(self.max_concurrency, 1)
+        )
+        return HTTPException(
+            status_code=503,
+            detail="CampusBot is busy right now, please retry shortly",
+            headers={"Retry-After": str(max(1, retry_after))},
+        )
+
+
+llm_scheduler = LLMScheduler()
+
+llm_queue_wait = registry.histogram(
+    "campusbot_llm_queue_wait_seconds", "Time spent waiting for an LLM call slot"
+)
+llm_shed = registry.counter(
+    "campusbot_llm_shed_total", "LLM calls rejected by admission control, by reason"
+)
+registry.gauge(
+    "campusbot_llm_queue_depth",
+    "Requests waiting for an LLM call slot, by tier",
+    llm_scheduler.queue_depth,
+)
+registry.gauge(
+    "campusbot_llm_active_calls",
+    "Upstream LLM calls in progress",
+    lambda: llm_scheduler.active,
+)
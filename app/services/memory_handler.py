@@ -1,4 +1,5 @@
 import os
+from functools import cached_property
 from dotenv import load_dotenv
 from urllib.parse import urlparse
 
@@ -18,12 +19,39 @@ from langchain_core.globals import set_llm_cache
 from langchain_core.caches import InMemoryCache
 
 from app.services.prompt_template import PromptTemplateService
+from app.services.redis_client import get_redis_client
+from app.utils.metrics import trace_stage
 
 load_dotenv()
 
 # Enable caching for better performance
 set_llm_cache(InMemoryCache())
 
+# Compiled once; static system message first, history and question after it
+MODERN_CHAT_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        SystemMessage(
+            content="You are CampusBot, a specialized AI assistant for New Mexico "
+            "colleges and career guidance."
+        ),
+        MessagesPlaceholder(variable_name="chat_history"),
+        HumanMessagePromptTemplate.from_template("{text}"),
+    ]
+)
+
+
+def append_turn_to_memory(
+    user_id: str, question: str, answer: str, ttl_seconds: int = 3600
+):
+    """Record a turn in the user's Redis memory without building any LLM chain"""
+    chat_history = RedisChatMessageHistory(
+        session_id=f"chat:{user_id}", url=os.getenv("REDIS_URL"), ttl=ttl_seconds
+    )
+    chat_history.redis_client = get_redis_client()
+    chat_history.add_messages(
+        [HumanMessage(content=question), AIMessage(content=answer)]
+    )
+
 
 class MemoryHandler:
     def __init__(self, user_id: str, max_turns: int = 5, ttl_seconds: int = 3600):
@@ -45,27 +73,27 @@ class MemoryHandler:
         self.chat_history = RedisChatMessageHistory(
             session_id=f"chat:{self.user_id}", url=redis_url, ttl=self.ttl_seconds
         )
+        # Reuse the shared connection pool instead of a new one per request
+        self.chat_history.redis_client = get_redis_client()
+
+        self.prompt = MODERN_CHAT_PROMPT
 
-        # Modern ConversationBufferWindowMemory with Redis backend
-        self.memory = ConversationBufferWindowMemory(
+    # The chat endpoint only reads and writes Redis history; the LLM and chains
+    # below are built on first use rather than for every request
+
+    @cached_property
+    def memory(self):
+        """Modern ConversationBufferWindowMemory with Redis backend"""
+        return ConversationBufferWindowMemory(
             memory_key="chat_history",
             return_messages=True,
             chat_memory=self.chat_history,
             k=self.max_turns,
         )
 
-        self.prompt = ChatPromptTemplate.from_messages(
-            [
-                SystemMessage(
-                    content="You are CampusBot, a specialized AI assistant for New Mexico colleges and career guidance."
-                ),
-                MessagesPlaceholder(variable_name="chat_history"),
-                HumanMessagePromptTemplate.from_template("{text}"),
-            ]
-        )
-
-        # Initialize LLM
-        self.llm = ChatOpenAI(
+    @cached_property
+    def llm(self):
+        return ChatOpenAI(
             model="gpt-4o-mini",
             temperature=0.2,
             openai_api_key=os.getenv("OPENAI_API_KEY"),
@@ -73,15 +101,19 @@ class MemoryHandler:
             request_timeout=30,
         )
 
-        # Legacy chain uses your detailed prompt
-        self.legacy_chain = LLMChain(
+    @cached_property
+    def legacy_chain(self):
+        """Legacy chain uses your detailed prompt"""
+        return LLMChain(
             llm=self.llm,
             prompt=self.qa_prompt,
             memory=self.memory,
         )
 
-        # Modern LCEL chain uses simpler ChatPromptTemplate
-        self.modern_chain = self._setup_modern_chain()
+    @cached_property
+    def modern_chain(self):
+        """Modern LCEL chain uses simpler ChatPromptTemplate"""
+        return self._setup_modern_chain()
 
     def _setup_modern_chain(self):
         """Setup modern LCEL chain with message history"""
@@ -103,12 +135,13 @@ class MemoryHandler:
     # Message management methods
     def add_message(self, message):
         """Add a LangChain message object (HumanMessage or AIMessage)"""
-        if isinstance(message, HumanMessage):
-            self.chat_history.add_user_message(message.content)
-        elif isinstance(message, AIMessage):
-            self.chat_history.add_ai_message(message.content)
-        else:
-            self.chat_history.add_message(message)
+        with trace_stage("memory.redis_write"):
+            if isinstance(message, HumanMessage):
+                self.chat_history.add_user_message(message.content)
+            elif isinstance(message, AIMessage):
+                self.chat_history.add_ai_message(message.content)
+            else:
+                self.chat_history.add_message(message)
 
     def add_user_message(self, message: str):
         """Add user message as string"""
@@ -124,7 +157,8 @@ class MemoryHandler:
 
     def get_recent_messages(self, limit: int = None) -> list:
         """Get recent messages with optional limit"""
-        messages = self.chat_history.messages
+        with trace_stage("memory.redis_read"):
+            messages = self.chat_history.messages
         if limit:
             return messages[-limit:]
         return (
@@ -201,3 +235,78 @@ class MemoryHandler:
             "ai_messages": ai_count,
             "conversation_pairs": min(user_count, ai_count),
         }
+
+
+class WarmMemoryHandler(MemoryHandler):
+    """
+    MemoryHandler for a long-lived connection.
+
+    The recent window is read from Redis once and then kept in the
+    connection; writes still go through to Redis, so the HTTP endpoints and
+    later connections see every turn. Turns written by another connection
+    of the same user are not picked up until the next connection.
+    """
+
+    def __init__(self, user_id: str, max_turns: int = 5, ttl_seconds: int = 3600):
+        super().__init__(user_id, max_turns=max_turns, ttl_seconds=ttl_seconds)
+        # Deep enough for the largest history window any model route sends
+        self.window_size = max(20, max_turns * 2)
+        self._window = None
+
+    def add_message(self, message):
+        super().add_message(message)
+        self._remember(message)
+
+    def add_user_message(self, message: str):
+        super().add_user_message(message)
+        self._remember(HumanMessage(content=message))
+
+    def add_ai_message(self, message: str):
+        super().add_ai_message(message)
+        self._remember(AIMessage(content=message))
+
+    def get_recent_messages(self, limit: int = None) -> list:
+        messages = list(self._messages())
+        if limit:
+            return messages[-limit:]
+        return messages[-self.max_turns * 2 :]
+
+    def clear(self):
+        super().clear()
+        self._window = []
+
+    def _messages(self) -> list:
+        if self._window is None:
+            with trace_stage("memory.redis_read"):
+                self._window = self.chat_history.messages[-self.window_size :]
+        return self._window
+
+    def _remember(self, message):
+        if self._window is None:
+            # Not loaded yet; the first read picks the message up from Redis
+            return
+        self._window.append(message)
+        del self._window[: -self.window_size]
+
+
+class EphemeralMemoryHandler:
+    """
+    Memory for one-off questions such as batch runs: the history lives only
+    in this object, so answers neither read nor change the user's Redis
+    memory. Implements the part of MemoryHandler that ChatService uses.
+    """
+
+    def __init__(self):
+        self.messages = []
+
+    def add_message(self, message):
+        self.messages.append(message)
+
+    def add_user_message(self, message: str):
+        self.messages.append(HumanMessage(content=message))
+
+    def add_ai_message(self, message: str):
+        self.messages.append(AIMessage(content=message))
+
+    def get_recent_messages(self, limit: int = None) -> list:
+        return self.messages[-limit:] if limit else list(self.messages)
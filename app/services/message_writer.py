@@ -0,0 +1,365 @@
+import asyncio
+import fcntl
+import glob
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+from sqlalchemy import insert
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.database import SessionLocal
+from app.models import ChatMessage
+from app.utils.metrics import registry, trace_stage
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MESSAGE_FLUSH_SIZE = int(os.getenv("MESSAGE_FLUSH_SIZE", 50))
+MESSAGE_FLUSH_INTERVAL = float(os.getenv("MESSAGE_FLUSH_INTERVAL", 0.5))
+# Base name of the journal files; each process writes its own
+# `<path>.<pid>.live` journal next to it
+MESSAGE_JOURNAL_PATH = os.getenv(
+    "MESSAGE_JOURNAL_PATH", os.path.join(BASE_DIR, "../message_journal.jsonl")
+)
+
+# The database is unreachable: keep the rows and try again on the next flush
+TRANSIENT_DB_ERRORS = (OperationalError, InterfaceError, PoolTimeoutError)
+
+message_writer_failures = registry.counter(
+    "campusbot_message_writer_failures_total",
+    "Chat message flush failures, by kind (transient, dead_letter)",
+)
+
+
+class MessageWriter:
+    """
+    Write-behind queue for chat message inserts.
+
+    Messages are appended to this process's journal (fsync'd) before the
+    request is acknowledged, then flushed to the database in batches by a
+    background thread once `flush_size` rows are pending or `flush_interval`
+    seconds have passed. Each process holds an exclusive lock on its own
+    journal for its lifetime; on startup, journals whose lock is free (their
+    process died) are replayed, so acknowledged messages are delivered at
+    least once and never by two processes.
+
+    While the database is unreachable, rows stay pending and on disk. A
+    batch rejected for its content is retried row by row; rows that still
+    fail are moved to `<path>.deadletter.jsonl` instead of blocking every
+    later flush.
+    """
+
+    def __init__(
+        self,
+        journal_path: str = MESSAGE_JOURNAL_PATH,
+        flush_size: int = MESSAGE_FLUSH_SIZE,
+        flush_interval: float = MESSAGE_FLUSH_INTERVAL,
+    ):
+        self.base_path = os.path.abspath(journal_path)
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+
+        self._pending = []
+        # Journal segments holding pending rows that a failed flush put back
+        self._retained = []
+        # Sessions with rows in the batch a flush is inserting right now
+        self._flushing = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._journal = None
+        self._owner_lock = None
+        self.journal_path = None
+
+    # === Lifecycle ===
+
+    def start(self):
+        """Replay orphaned journals and start the background flusher"""
+        if self._thread is not None:
+            return
+        os.makedirs(os.path.dirname(self.base_path), exist_ok=True)
+        # Serialize startup so two new workers don't replay the same orphan
+        with open(f"{self.base_path}.replay.lock", "a") as replay_lock:
+            fcntl.flock(replay_lock, fcntl.LOCK_EX)
+            try:
+                self._replay_orphans()
+                self._owner_lock = self._claim(os.getpid())
+            finally:
+                fcntl.flock(replay_lock, fcntl.LOCK_UN)
+        self.journal_path = self._journal_path(os.getpid())
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="message-writer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Flush everything that is pending and stop the background flusher"""
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if self._owner_lock is not None:
+            # Anything still on disk is replayed by the next process to start
+            fcntl.flock(self._owner_lock, fcntl.LOCK_UN)
+            self._owner_lock.close()
+            self._owner_lock = None
+
+    # === Public API ===
+
+    def enqueue(self, rows: list[dict]):
+        """Durably record message rows and schedule them for a batched insert"""
+        if self._thread is None:
+            # Writer not running (e.g. scripts, tests): insert synchronously
+            self._insert(rows)
+            return
+
+        with self._lock:
+            for row in rows:
+                self._journal.write(json.dumps(self._serialize(row)) + "\n")
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._pending.extend(rows)
+            pending_count = len(self._pending)
+
+        if pending_count >= self.flush_size:
+            self._wakeup.set()
+
+    async def aenqueue(self, rows: list[dict]):
+        """enqueue() for async callers: the fsync runs off the event loop"""
+        await asyncio.to_thread(self.enqueue, rows)
+
+    def has_pending(self, session_id=None) -> bool:
+        """True if rows (optionally for one session) are not yet committed"""
+        with self._lock:
+            if session_id is None:
+                return bool(self._pending or self._flushing)
+            return session_id in self._flushing or any(
+                row["session_id"] == session_id for row in self._pending
+            )
+
+    def flush_session(self, session_id):
+        """Commit the session's queued rows first, so reads and deletes see them"""
+        if self.has_pending(session_id):
+            # Waits for a flush already inserting them, then flushes the rest
+            self.flush()
+
+    def flush(self):
+        """Insert all pending rows in a single multi-row INSERT"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                batch = self._pending
+                self._pending = []
+                segments = self._retained + [self._rotate_journal()]
+                self._retained = []
+                self._flushing = {row["session_id"] for row in batch}
+
+            try:
+                try:
+                    with trace_stage("message_writer.flush"):
+                        self._insert(batch)
+                    unsent = []
+                except TRANSIENT_DB_ERRORS as e:
+                    print("❌ Message flush failed, will retry:", e)
+                    message_writer_failures.inc(kind="transient")
+                    unsent = batch
+                except Exception as e:
+                    print("⚠️ Message batch rejected, inserting row by row:", e)
+                    unsent = self._insert_each(batch)
+
+                if unsent:
+                    self._put_back(unsent)
+                for segment in segments:
+                    if segment:
+                        os.remove(segment)
+            finally:
+                with self._lock:
+                    self._flushing = set()
+
+    # === Internal Helpers ===
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _insert(self, rows: list[dict]):
+        db = SessionLocal()
+        try:
+            db.execute(insert(ChatMessage), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _insert_each(self, rows: list[dict]) -> list[dict]:
+        """Insert rows one at a time; dead-letter bad ones, return the unsent rest"""
+        for i, row in enumerate(rows):
+            try:
+                self._insert([row])
+            except TRANSIENT_DB_ERRORS as e:
+                print("❌ Message flush failed, will retry:", e)
+                message_writer_failures.inc(kind="transient")
+                return rows[i:]
+            except Exception as e:
+                message_writer_failures.inc(kind="dead_letter")
+                self._dead_letter(row, e)
+        return []
+
+    def _put_back(self, rows: list[dict]):
+        """Requeue unsent rows in front, backed by a segment of just those rows"""
+        segment = f"{self.journal_path}.{uuid.uuid4().hex}.flushing"
+        self._write_segment(segment, rows)
+        with self._lock:
+            self._pending = rows + self._pending
+            self._retained.append(segment)
+
+    def _dead_letter(self, row: dict, error: Exception):
+        print(f"❌ Chat message dead-lettered ({type(error).__name__}):", error)
+        with open(f"{self.base_path}.deadletter.jsonl", "a", encoding="utf-8") as f:
+            record = {**self._serialize(row), "error": str(error)}
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rotate_journal(self) -> str | None:
+        """Move the live journal aside so new writes go to a fresh file"""
+        if self._journal is None:
+            return None
+        self._journal.close()
+        segment = f"{self.journal_path}.{uuid.uuid4().hex}.flushing"
+        os.replace(self.journal_path, segment)
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        return segment
+
+    def _write_segment(self, path: str, rows: list[dict]):
+        with open(path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(self._serialize(row)) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _journal_path(self, pid: int) -> str:
+        return f"{self.base_path}.{pid}.live"
+
+    def _claim(self, pid: int):
+        """Lock `pid`'s journal; None if its process is still alive"""
+        lock_file = open(f"{self.base_path}.{pid}.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    def _replay_orphans(self):
+        """Insert rows from journals of processes that did not get to flush"""
+        # Journal of the single-file layout used before per-process journals
+        if os.path.exists(self.base_path):
+            self._replay_segments([self.base_path])
+
+        for lock_path in glob.glob(f"{self.base_path}.*.lock"):
+            pid = lock_path[len(self.base_path) + 1 : -len(".lock")]
+            if not pid.isdigit():
+                continue
+            lock_file = self._claim(int(pid))
+            if lock_file is None:
+                continue
+            try:
+                journal = self._journal_path(int(pid))
+                segments = glob.glob(f"{journal}.*.flushing")
+                if os.path.exists(journal):
+                    segments.append(journal)
+                self._replay_segments(segments)
+                os.remove(lock_path)
+            finally:
+                lock_file.close()
+
+    def _replay_segments(self, segments: list[str]):
+        for segment in segments:
+            with open(segment, encoding="utf-8") as f:
+                rows = [
+                    self._deserialize(json.loads(line)) for line in f if line.strip()
+                ]
+            if rows:
+                try:
+                    self._insert(rows)
+                except TRANSIENT_DB_ERRORS:
+                    raise
+                except Exception:
+                    unsent = self._insert_each(rows)
+                    if unsent:
+                        # Database went away mid-replay; keep what is left
+                        self._write_segment(segment, unsent)
+                        raise RuntimeError("Database unavailable during replay")
+                print(f"✅ Replayed {len(rows)} journaled chat messages")
+            os.remove(segment)
+
+    @staticmethod
+    def _serialize(row: dict) -> dict:
+        return {
+            **row,
+            "session_id": str(row["session_id"]),
+            "timestamp": row["timestamp"].isoformat(),
+        }
+
+    @staticmethod
+    def _deserialize(row: dict) -> dict:
+        return {
+            **row,
+            "session_id": uuid.UUID(row["session_id"]),
+            "timestamp": datetime.fromisoformat(row["timestamp"]),
+        }
+
+
+def build_message_rows(
+    user_id: int, session_id, user_message: str, bot_response: str
+) -> list[dict]:
+    """Build the user/assistant row pair for one chat turn"""
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "user_id": user_id,
+            "session_id": session_id,
+            "role": "user",
+            "content": user_message,
+            "timestamp": now,
+        },
+        {
+            "user_id": user_id,
+            "session_id": session_id,
+            "role": "assistant",
+            "content": bot_response,
+            # Keep the assistant reply strictly after the question
+            "timestamp": now + timedelta(microseconds=1),
+        },
+    ]
+
+
+message_writer = MessageWriter()
+
+registry.gauge(
+    "campusbot_message_writer_pending",
+    "Chat messages journaled but not yet inserted",
+    lambda: len(message_writer._pending),
+)
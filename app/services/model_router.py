@@ -0,0 +1,197 @@
+import os
+import re
+import threading
+
+from dotenv import load_dotenv
+
+from app.config import LLM_ALLOWED_MODELS, LLM_DEFAULT_MODEL
+from app.utils.intent_matcher import intent_matcher
+from app.utils.keyword_automaton import normalize_text
+from app.utils.metrics import registry
+
+load_dotenv()
+
+MODEL_ROUTING_ENABLED = os.getenv("MODEL_ROUTING_ENABLED", "true").lower() == "true"
+# Also score retrieval confidence; loads the embedding model and FAISS index
+MODEL_ROUTING_USE_RETRIEVAL = (
+    os.getenv("MODEL_ROUTING_USE_RETRIEVAL", "false").lower() == "true"
+)
+# One line per routed request; for tuning, not for production traffic
+MODEL_ROUTING_LOG = os.getenv("MODEL_ROUTING_LOG", "false").lower() == "true"
+
+# route -> model, completion token cap and number of history messages sent.
+# Caps leave room for the structured-output JSON around the answer; an answer
+# that still hits one is served truncated rather than failed.
+ROUTES = {
+    # Used when routing is off: server default model, no extra token cap
+    "default": {"model": None, "max_tokens": None, "history_messages": 10},
+    "simple": {
+        "model": os.getenv("MODEL_ROUTE_SIMPLE_MODEL", "gpt-4o-mini"),
+        "max_tokens": int(os.getenv("MODEL_ROUTE_SIMPLE_MAX_TOKENS", 512)),
+        "history_messages": int(os.getenv("MODEL_ROUTE_SIMPLE_HISTORY", 4)),
+    },
+    "standard": {
+        "model": os.getenv("MODEL_ROUTE_STANDARD_MODEL", "gpt-4o-mini"),
+        "max_tokens": int(os.getenv("MODEL_ROUTE_STANDARD_MAX_TOKENS", 1024)),
+        "history_messages": int(os.getenv("MODEL_ROUTE_STANDARD_HISTORY", 10)),
+    },
+    "complex": {
+        # The server default model unless operators opt in to a larger one
+        "model": os.getenv("MODEL_ROUTE_COMPLEX_MODEL") or None,
+        "max_tokens": int(os.getenv("MODEL_ROUTE_COMPLEX_MAX_TOKENS", 2048)),
+        "history_messages": int(os.getenv("MODEL_ROUTE_COMPLEX_HISTORY", 10)),
+    },
+}
+
+SIMPLE_MAX_WORDS = int(os.getenv("MODEL_ROUTE_SIMPLE_MAX_WORDS", 12))
+COMPLEX_MIN_WORDS = int(os.getenv("MODEL_ROUTE_COMPLEX_MIN_WORDS", 40))
+# Share of the question covered by quick-button keywords to count as an FAQ
+SIMPLE_MIN_COVERAGE = float(os.getenv("MODEL_ROUTE_SIMPLE_MIN_COVERAGE", 0.3))
+SIMPLE_MIN_RELEVANCE = float(os.getenv("MODEL_ROUTE_SIMPLE_MIN_RELEVANCE", 0.75))
+
+# Comparisons and multi-part questions need the larger model
+_COMPLEX_MARKERS = re.compile(
+    r"\b(compare|comparison|versus|vs|difference between|better than|"
+    r"pros and cons|step by step|explain why)\b"
+)
+
+route_decisions = registry.counter(
+    "campusbot_model_route_total", "Chat requests by model route and chosen model"
+)
+route_tokens = registry.counter(
+    "campusbot_model_route_tokens_total", "OpenAI tokens consumed by model route"
+)
+route_latency = registry.histogram(
+    "campusbot_model_route_llm_seconds", "LLM response time by model route"
+)
+
+
+class RouteStats:
+    """Per-route request counts, tokens and LLM time, for cost/latency review"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, decision: dict, usage: dict, elapsed: float):
+        route, model = decision["route"], decision["model"] or "default"
+        route_tokens.inc(usage["total_tokens"], route=route, model=model)
+        route_latency.observe(elapsed, route=route, model=model)
+        with self._lock:
+            stats = self._routes.setdefault(
+                route,
+                {
+                    "requests": 0,
+                    "total_tokens": 0,
+                    "prompt_tokens": 0,
+                    "cached_prompt_tokens": 0,
+                    "llm_seconds": 0.0,
+                },
+            )
+            stats["requests"] += 1
+            stats["total_tokens"] += usage["total_tokens"]
+            stats["prompt_tokens"] += usage["input_tokens"]
+            stats["cached_prompt_tokens"] += usage["cached_input_tokens"]
+            stats["llm_seconds"] += elapsed
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                route: {
+                    **stats,
+                    "avg_tokens": stats["total_tokens"] / stats["requests"],
+                    "avg_llm_ms": stats["llm_seconds"] * 1000 / stats["requests"],
+                    "prompt_cache_hit_ratio": (
+                        stats["cached_prompt_tokens"] / stats["prompt_tokens"]
+                        if stats["prompt_tokens"]
+                        else 0.0
+                    ),
+                }
+                for route, stats in self._routes.items()
+            }
+
+
+route_stats = RouteStats()
+
+
+def route_configurations() -> list[tuple]:
+    """(model, max_tokens) of every route choose_route can currently pick"""
+    names = ("simple", "standard", "complex") if MODEL_ROUTING_ENABLED else ("default",)
+    pairs = [(ROUTES[name]["model"], ROUTES[name]["max_tokens"]) for name in names]
+    return list(dict.fromkeys(pairs))
+
+
+def _validate_route_models():
+    """Routes whose model the handler registry would refuse use the default"""
+    for name, route in ROUTES.items():
+        if route["model"] and route["model"] not in LLM_ALLOWED_MODELS:
+            print(
+                f"⚠️ Model {route['model']} for route {name} is not in "
+                f"LLM_ALLOWED_MODELS; using {LLM_DEFAULT_MODEL}"
+            )
+            route["model"] = None
+
+
+# Checked once at import, i.e. when the app starts
+_validate_route_models()
+
+
+def choose_route(message: str, pinned_model: str | None = None) -> dict:
+    """
+    Classify a chat message and pick model, max_tokens and history depth.
+
+    A model pinned by the client is kept; the route then only decides the
+    token cap and history window.
+    """
+    text = normalize_text(message)
+    words = len(text.split())
+    match = intent_matcher.match(message)
+    coverage = match["coverage"] if match else 0.0
+    signals = {"words": words, "intent_coverage": round(coverage, 2)}
+
+    if not MODEL_ROUTING_ENABLED:
+        route, reason = "default", "routing disabled"
+    elif words >= COMPLEX_MIN_WORDS:
+        route, reason = "complex", "long question"
+    elif _COMPLEX_MARKERS.search(text) or message.count("?") > 1:
+        route, reason = "complex", "comparison or multi-part question"
+    elif words <= SIMPLE_MAX_WORDS and coverage >= SIMPLE_MIN_COVERAGE:
+        route, reason = "simple", "short question matching a known intent"
+    else:
+        route, reason = "standard", "default"
+        relevance = _retrieval_relevance(message)
+        if relevance is not None:
+            signals["retrieval_relevance"] = round(relevance, 2)
+            if words <= SIMPLE_MAX_WORDS and relevance >= SIMPLE_MIN_RELEVANCE:
+                route, reason = "simple", "short question with confident retrieval"
+
+    decision = {
+        **ROUTES[route],
+        "route": route,
+        "reason": reason,
+        "signals": signals,
+        "pinned": bool(pinned_model),
+    }
+    if pinned_model:
+        decision["model"] = pinned_model
+
+    route_decisions.inc(route=route, model=decision["model"] or "default")
+    if MODEL_ROUTING_LOG:
+        print(
+            f"🧭 Route {route} -> {decision['model'] or 'default model'} "
+            f"(max_tokens={decision['max_tokens']}, "
+            f"history={decision['history_messages']}): {reason} {signals}"
+        )
+    return decision
+
+
+def _retrieval_relevance(message: str) -> float | None:
+    if not MODEL_ROUTING_USE_RETRIEVAL:
+        return None
+    from app.services.vector_store import get_vector_store_manager
+
+    try:
+        return get_vector_store_manager().best_relevance(message)
+    except Exception as e:
+        print("⚠️ Retrieval scoring for model routing failed:", e)
+        return None
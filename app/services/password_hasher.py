@@ -0,0 +1,138 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from app.utils.metrics import registry
+
+load_dotenv()
+
+# Raising BCRYPT_ROUNDS makes existing hashes "deprecated"; they are rehashed
+# transparently on the user's next successful login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 32))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS
+)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a small dedicated thread pool so login spikes cannot take
+    over the worker threads that serve chat traffic. At most
+    `max_workers + max_queue` operations may be in flight; beyond that the
+    request is shed with a 503 instead of queueing unboundedly. Async callers
+    use the `a*` methods, which await the pool without holding a thread.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = PASSWORD_HASH_WORKERS,
+        max_queue: int = PASSWORD_HASH_MAX_QUEUE,
+    ):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="bcrypt"
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self.stats = {
+            "operations": 0,
+            "rejected": 0,
+            "queue_wait_ms_total": 0.0,
+            "hash_ms_total": 0.0,
+            "hash_ms_max": 0.0,
+        }
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def hash(self, password: str) -> str:
+        return self._submit(pwd_context.hash, password).result()
+
+    async def ahash(self, password: str) -> str:
+        return await asyncio.wrap_future(self._submit(pwd_context.hash, password))
+
+    def verify_and_update(
+        self, plain_password: str, hashed_password: str
+    ) -> tuple[bool, str | None]:
+        """Verify a password; also returns a new hash if the stored one is outdated"""
+        return self._submit(
+            pwd_context.verify_and_update, plain_password, hashed_password
+        ).result()
+
+    async def averify_and_update(
+        self, plain_password: str, hashed_password: str
+    ) -> tuple[bool, str | None]:
+        return await asyncio.wrap_future(
+            self._submit(pwd_context.verify_and_update, plain_password, hashed_password)
+        )
+
+    # === Internal Helpers ===
+
+    def _submit(self, fn, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.stats["rejected"] += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Too many login attempts in progress, please retry",
+                headers={"Retry-After": "1"},
+            )
+
+        with self._stats_lock:
+            self._in_flight += 1
+        submitted_at = time.perf_counter()
+        try:
+            future = self._executor.submit(self._timed, fn, submitted_at, *args)
+        except Exception:
+            self._release()
+            raise
+        # Released when the work finishes or is cancelled, not when a caller
+        # stops waiting
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future: Future | None = None):
+        with self._stats_lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _timed(self, fn, submitted_at: float, *args):
+        started_at = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            finished_at = time.perf_counter()
+            hash_ms = (finished_at - started_at) * 1000
+            password_hash_latency.observe(finished_at - started_at)
+            with self._stats_lock:
+                self.stats["operations"] += 1
+                self.stats["queue_wait_ms_total"] += (started_at - submitted_at) * 1000
+                self.stats["hash_ms_total"] += hash_ms
+                self.stats["hash_ms_max"] = max(self.stats["hash_ms_max"], hash_ms)
+
+
+password_hasher = PasswordHasher()
+
+password_hash_latency = registry.histogram(
+    "campusbot_password_hash_seconds", "bcrypt hash/verify time, excluding queueing"
+)
+registry.gauge(
+    "campusbot_password_hash_in_flight",
+    "bcrypt operations running or queued",
+    lambda: password_hasher.in_flight,
+)
+registry.gauge(
+    "campusbot_password_hash_rejected",
+    "bcrypt operations shed because the queue was full",
+    lambda: password_hasher.stats["rejected"],
+)
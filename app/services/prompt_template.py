@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from langchain_core.prompts import (
     PromptTemplate,
     ChatPromptTemplate,
@@ -6,16 +8,9 @@ from langchain_core.prompts import (
 )
 from langchain_core.messages import SystemMessage
 
-
-class PromptTemplateService:
-    @staticmethod
-    def get_qa_prompt(detailed=False):
-        """Get the appropriate QA prompt template"""
-        if detailed:
-            return PromptTemplate(
-                input_variables=["chat_history", "question"],
-                template="""
-# CampusBot - Your New Mexico College & Career Guide
+# Static head of the detailed QA template; keep per-request values out of it so
+# the rendered prompt starts with the same bytes every time
+CAMPUSBOT_SYSTEM_PROMPT = """# CampusBot - Your New Mexico College & Career Guide
 
 ## Role & Identity
 You are CampusBot, a specialized AI assistant dedicated to helping students find and compare colleges in New Mexico. You serve as both a college advisor and career counselor, guiding students through their educational journey from selection to graduation.
@@ -57,7 +52,23 @@ Help students make informed decisions about higher education in New Mexico by pr
 - Direct students to official college websites and resources for detailed information
 - Ask clarifying questions to better understand student needs and preferences
 
-Focus on being the comprehensive resource students need to navigate their college journey successfully in New Mexico.
+Focus on being the comprehensive resource students need to navigate their college journey successfully in New Mexico."""
+
+
+class PromptTemplateService:
+    # Templates are compiled once and shared; they are immutable once built
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_qa_prompt(detailed=False):
+        """Get the appropriate QA prompt template"""
+        if detailed:
+            # Static block first; history and question only at the end
+            return PromptTemplate(
+                input_variables=["chat_history", "question"],
+                template="\n"
+                + CAMPUSBOT_SYSTEM_PROMPT
+                + """
 
 Previous conversation:
 {chat_history}
@@ -80,6 +91,7 @@ Provide helpful response about New Mexico colleges:""",
             )
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def get_chat_prompt_template(detailed=False):
         """Get ChatPromptTemplate version"""
         if detailed:
@@ -103,6 +115,7 @@ Focus on being the comprehensive resource students need to navigate their colleg
         )
 
     @staticmethod
+    @lru_cache(maxsize=None)
     def get_followup_prompt():
         """For generating follow-up questions"""
         return PromptTemplate(
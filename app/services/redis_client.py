@@ -0,0 +1,30 @@
+import os
+import threading
+
+import redis
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_client = None
+_lock = threading.Lock()
+
+
+def get_redis_client() -> redis.Redis:
+    """Process-wide Redis client backed by one shared connection pool"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                redis_url = os.getenv("REDIS_URL")
+                if not redis_url:
+                    raise ValueError(" REDIS_URL not set in environment.")
+                _client = redis.Redis.from_url(redis_url, health_check_interval=30)
+    return _client
+
+
+def use_redis_client(client):
+    """Replace the shared client, e.g. with a local stand-in for benchmarks"""
+    global _client
+    with _lock:
+        _client = client
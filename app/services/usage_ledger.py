@@ -0,0 +1,213 @@
+import os
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import TokenUsage
+from app.utils.metrics import registry, trace_stage
+
+load_dotenv()
+
+USAGE_LEDGER_ENABLED = os.getenv("USAGE_LEDGER_ENABLED", "true").lower() == "true"
+USAGE_FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", 10))
+# Consecutive failed flushes after which the pending usage is dropped
+USAGE_MAX_FLUSH_FAILURES = int(os.getenv("USAGE_MAX_FLUSH_FAILURES", 6))
+
+_COUNTS = ("input_tokens", "cached_input_tokens", "output_tokens", "total_tokens")
+
+usage_dropped = registry.counter(
+    "campusbot_usage_ledger_dropped_tokens_total",
+    "Tokens whose usage rows were dropped after repeated failed flushes",
+)
+
+# (user_id, session_id) whose request the current OpenAI calls are made for;
+# copied into tasks and worker threads started from it, like the deadline
+_usage_owner: ContextVar[tuple | None] = ContextVar("usage_owner", default=None)
+
+
+def set_usage_owner(user_id: int | None, session_id=None):
+    """Attribute OpenAI usage recorded from here on to this user and session"""
+    _usage_owner.set((user_id, session_id))
+
+
+class UsageLedger:
+    """
+    Per-user OpenAI token ledger.
+
+    Every OpenAI response's usage is added to an in-process aggregate keyed
+    by (day, user, session, model, call). A background thread writes the
+    aggregate to the token_usage table every `flush_interval` seconds as one
+    multi-row INSERT, so a chat turn costs a dict update instead of a write.
+    A row is a partial sum; reports add up rows with the same key. Usage not
+    yet flushed when the process dies is lost, which is acceptable for
+    accounting that feeds tuning rather than billing; so is usage still
+    failing to flush after `max_failures` attempts in a row, which is
+    dropped (and counted) rather than kept in memory indefinitely.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = USAGE_FLUSH_INTERVAL,
+        max_failures: int = USAGE_MAX_FLUSH_FAILURES,
+    ):
+        self.flush_interval = flush_interval
+        self.max_failures = max_failures
+        self._failures = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    # === Lifecycle ===
+
+    def start(self):
+        if self._thread is not None or not USAGE_LEDGER_ENABLED:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="usage-ledger", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Flush everything that is pending and stop the background flusher"""
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    # === Public API ===
+
+    def record(self, model: str, call: str, usage: dict):
+        """Add one OpenAI response's token usage to the current owner's totals"""
+        if not USAGE_LEDGER_ENABLED or not usage["total_tokens"]:
+            return
+        user_id, session_id = _usage_owner.get() or (None, None)
+        key = (datetime.now(timezone.utc).date(), user_id, session_id, model, call)
+        with self._lock:
+            totals = self._pending.setdefault(
+                key, {"requests": 0, **{count: 0 for count in _COUNTS}}
+            )
+            totals["requests"] += 1
+            for count in _COUNTS:
+                totals[count] += usage[count]
+
+    def flush(self):
+        """Insert the pending aggregate in a single multi-row INSERT"""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                batch = self._pending
+                self._pending = {}
+
+            try:
+                with trace_stage("usage_ledger.flush"):
+                    self._insert(batch)
+            except Exception as e:
+                self._failures += 1
+                if self._failures < self.max_failures:
+                    print("❌ Token usage flush failed, will retry:", e)
+                    with self._lock:
+                        self._merge(batch)
+                    return
+                tokens = sum(totals["total_tokens"] for totals in batch.values())
+                print(
+                    f"❌ Token usage flush failed {self._failures} times, "
+                    f"dropping {len(batch)} rows ({tokens} tokens):",
+                    e,
+                )
+                usage_dropped.inc(tokens)
+            self._failures = 0
+
+    # === Internal Helpers ===
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _insert(self, batch: dict):
+        rows = [
+            {
+                "day": day,
+                "user_id": user_id,
+                "session_id": session_id,
+                "model": model,
+                "call": call,
+                **totals,
+            }
+            for (day, user_id, session_id, model, call), totals in batch.items()
+        ]
+        db = SessionLocal()
+        try:
+            db.execute(insert(TokenUsage), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _merge(self, batch: dict):
+        """Put a failed batch back, adding to anything recorded meanwhile"""
+        for key, totals in batch.items():
+            pending = self._pending.setdefault(key, dict.fromkeys(totals, 0))
+            for name, value in totals.items():
+                pending[name] += value
+
+
+def summarize_usage(db: Session, days: int = 7, user_id: int | None = None) -> dict:
+    """Token totals per day/model/call and the heaviest users over `days` days"""
+    since = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+    sums = [func.sum(getattr(TokenUsage, name)).label(name) for name in _COUNTS]
+    requests = func.sum(TokenUsage.requests).label("requests")
+
+    filters = [TokenUsage.day >= since]
+    if user_id is not None:
+        filters.append(TokenUsage.user_id == user_id)
+
+    by_model = db.execute(
+        select(TokenUsage.day, TokenUsage.model, TokenUsage.call, requests, *sums)
+        .where(*filters)
+        .group_by(TokenUsage.day, TokenUsage.model, TokenUsage.call)
+        .order_by(TokenUsage.day.desc(), TokenUsage.model, TokenUsage.call)
+    ).all()
+    top_users = db.execute(
+        select(TokenUsage.user_id, requests, *sums)
+        .where(*filters)
+        .group_by(TokenUsage.user_id)
+        .order_by(func.sum(TokenUsage.total_tokens).desc())
+        .limit(20)
+    ).all()
+
+    totals = {name: sum(row._mapping[name] for row in by_model) for name in _COUNTS}
+    totals["requests"] = sum(row.requests for row in by_model)
+    return {
+        "since": since.isoformat(),
+        "totals": totals,
+        "by_day_model_call": [
+            {**row._mapping, "day": row.day.isoformat()} for row in by_model
+        ],
+        "top_users": [dict(row._mapping) for row in top_users],
+    }
+
+
+usage_ledger = UsageLedger()
+
+registry.gauge(
+    "campusbot_usage_ledger_pending",
+    "Token usage aggregates recorded but not yet written to the database",
+    lambda: len(usage_ledger._pending),
+)
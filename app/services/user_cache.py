@@ -0,0 +1,176 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.models import User
+from app.services.redis_client import get_redis_client
+from app.utils.metrics import cache_requests
+
+load_dotenv()
+
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", 60))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", 10000))
+# Set to "true" to share cached principals between workers through Redis
+USER_CACHE_USE_REDIS = os.getenv("USER_CACHE_USE_REDIS", "false").lower() == "true"
+
+# Only what request handlers need; never the password hash
+CACHED_FIELDS = (
+    "id",
+    "role",
+    "email",
+    "full_name",
+    "is_premium",
+    "has_free_pdf_access",
+    "created_at",
+)
+
+
+class UserCache:
+    """
+    Short-TTL cache of authenticated users.
+
+    Lookups hit an in-process LRU first, then (optionally) Redis, and only
+    fall back to the database on a miss. Entries are invalidated whenever a
+    User row is updated or deleted through the ORM, and expire after
+    `ttl_seconds` so changes made by other workers are picked up quickly.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = USER_CACHE_TTL_SECONDS,
+        max_size: int = USER_CACHE_MAX_SIZE,
+        use_redis: bool = USER_CACHE_USE_REDIS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._use_redis = use_redis and self._redis_configured()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, db: Session, user_id: int) -> User | None:
+        """Return a detached User snapshot, loading from the DB only on a miss"""
+        fields = self._get_local(user_id) or self._get_redis(user_id)
+        if fields is not None:
+            self.hits += 1
+            cache_requests.inc(cache="user", result="hit")
+            return self._to_user(fields)
+
+        self.misses += 1
+        cache_requests.inc(cache="user", result="miss")
+        user = db.query(User).filter(User.id == user_id).first()
+        if user is None:
+            return None
+
+        fields = {name: getattr(user, name) for name in CACHED_FIELDS}
+        self._set_local(user_id, fields)
+        self._set_redis(user_id, fields)
+        return user
+
+    def peek(self, user_id: int) -> dict | None:
+        """Cached fields for a user from the local tier only, without loading"""
+        return self._get_local(user_id)
+
+    def invalidate(self, user_id: int):
+        """Drop a user from every cache tier (e.g. after a role/premium change)"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+        if self._redis is not None:
+            try:
+                self._redis.delete(self._redis_key(user_id))
+            except Exception as e:
+                print("⚠️ User cache Redis delete failed:", e)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # === Internal Helpers ===
+
+    def _get_local(self, user_id: int) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, fields = entry
+            if expires_at < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return fields
+
+    def _set_local(self, user_id: int, fields: dict):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, fields)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _get_redis(self, user_id: int) -> dict | None:
+        if self._redis is None:
+            return None
+        try:
+            raw = self._redis.get(self._redis_key(user_id))
+        except Exception as e:
+            print("⚠️ User cache Redis read failed:", e)
+            return None
+        if raw is None:
+            return None
+
+        fields = json.loads(raw)
+        if fields.get("created_at"):
+            fields["created_at"] = datetime.fromisoformat(fields["created_at"])
+        self._set_local(user_id, fields)
+        return fields
+
+    def _set_redis(self, user_id: int, fields: dict):
+        if self._redis is None:
+            return
+        payload = dict(fields)
+        if payload.get("created_at"):
+            payload["created_at"] = payload["created_at"].isoformat()
+        try:
+            self._redis.set(
+                self._redis_key(user_id),
+                json.dumps(payload),
+                ex=max(1, int(self.ttl_seconds)),
+            )
+        except Exception as e:
+            print("⚠️ User cache Redis write failed:", e)
+
+    @staticmethod
+    def _redis_key(user_id: int) -> str:
+        return f"user:{user_id}"
+
+    @staticmethod
+    def _to_user(fields: dict) -> User:
+        # Transient instance: attribute access only, never added to a session
+        return User(**fields)
+
+    @property
+    def _redis(self):
+        return get_redis_client() if self._use_redis else None
+
+    @staticmethod
+    def _redis_configured() -> bool:
+        if not os.getenv("REDIS_URL"):
+            print("⚠️ USER_CACHE_USE_REDIS set without REDIS_URL; using local cache")
+            return False
+        return True
+
+
+user_cache = UserCache()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
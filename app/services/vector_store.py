@@ -1,9 +1,11 @@
 import os
+from functools import lru_cache
 from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 
+from app.utils.metrics import trace_stage
 from app.config import DEFAULT_PDF_PATH, USER_UPLOAD_PDF_PATH, VECTOR_INDEX_PATH
 
 
@@ -56,8 +58,27 @@ class VectorStoreManager:
         self.vectorstore.save_local(self.index_path)
         print("✅ User PDF vectorstore created and saved.")
 
+    def similarity_search(self, query: str, k: int = 4):
+        """Search the loaded index for the chunks closest to `query`"""
+        vectorstore = self.get_vectorstore()
+        with trace_stage("vector_store.search"):
+            return vectorstore.similarity_search(query, k=k)
+
+    def best_relevance(self, query: str) -> float:
+        """Relevance (0-1) of the closest chunk to `query`"""
+        vectorstore = self.get_vectorstore()
+        with trace_stage("vector_store.search"):
+            results = vectorstore.similarity_search_with_relevance_scores(query, k=1)
+        return results[0][1] if results else 0.0
+
     def get_vectorstore(self):
         """Return loaded FAISS vectorstore"""
         if self.vectorstore is None:
-            self.load_or_create()
+            with trace_stage("vector_store.load"):
+                self.load_or_create()
         return self.vectorstore
+
+
+@lru_cache(maxsize=1)
+def get_vector_store_manager() -> VectorStoreManager:
+    return VectorStoreManager()
@@ -0,0 +1,82 @@
+import os
+import threading
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.utils.button_loader import button_catalog
+
+load_dotenv()
+
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+
+
+class ButtonEmbeddingIndex:
+    """
+    Quick-button `question_text` entries embedded once into a normalized
+    NumPy matrix, so nearest-question lookups are a single matrix product.
+    Re-embedded when the button catalog reloads.
+    """
+
+    def __init__(
+        self, catalog=button_catalog, model_name: str = EMBEDDING_MODEL_NAME
+    ):
+        self.catalog = catalog
+        self.model_name = model_name
+        self._embeddings = None
+        self._lock = threading.Lock()
+        # Separate from _lock: building the index embeds, which takes _lock
+        self._index_lock = threading.Lock()
+        # (catalog version, buttons, unit-norm matrix [n_buttons, dim])
+        self._index = None
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Embed and L2-normalize texts into a [len(texts), dim] matrix"""
+        vectors = np.asarray(self._get_embeddings().embed_documents(texts))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def similarities(self, texts: list[str]) -> tuple[list, np.ndarray]:
+        """Cosine similarity of each text to every button: [len(texts), n_buttons]"""
+        buttons, matrix = self._get_index()
+        if not buttons or not texts:
+            return buttons, np.zeros((len(texts), len(buttons)))
+        return buttons, self.embed(texts) @ matrix.T
+
+    def nearest(self, text: str, k: int = 3) -> list[tuple[dict, float]]:
+        """The k buttons whose questions are closest to `text`, best first"""
+        buttons, scores = self.similarities([text])
+        if not buttons:
+            return []
+        row = scores[0]
+        top = np.argsort(-row)[:k]
+        return [(buttons[i], float(row[i])) for i in top]
+
+    # === Internal Helpers ===
+
+    def _get_embeddings(self):
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+                    self._embeddings = HuggingFaceEmbeddings(
+                        model_name=self.model_name
+                    )
+        return self._embeddings
+
+    def _get_index(self) -> tuple[list, np.ndarray]:
+        catalog_index = self.catalog.get()
+        if self._index is None or self._index[0] != catalog_index.version:
+            # One thread embeds the catalog; the others wait and reuse it
+            with self._index_lock:
+                if self._index is None or self._index[0] != catalog_index.version:
+                    buttons = catalog_index.buttons
+                    questions = [button["question_text"] for button in buttons]
+                    matrix = self.embed(questions) if buttons else None
+                    self._index = (catalog_index.version, buttons, matrix)
+        _, buttons, matrix = self._index
+        return buttons, matrix
+
+
+button_embeddings = ButtonEmbeddingIndex()
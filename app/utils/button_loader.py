@@ -1,9 +1,11 @@
 import csv
-from typing import List, Dict
+import hashlib
+import json
 import os
+import threading
+from typing import List, Dict
 
 
-# Safe path for your CSV
 csv_path = os.path.join(os.path.dirname(__file__), "../rag/quickbuttons(Sheet1).csv")
 
 
@@ -30,8 +32,65 @@ def load_button_data(file_path: str = csv_path) -> List[Dict]:
     return buttons
 
 
+class ButtonIndex:
+    """Immutable, indexed view of one version of the button CSV"""
+
+    def __init__(self, buttons: List[Dict], version: int, digest: str):
+        self.version = version
+        self.etag = f'"{digest}"'
+        self.buttons = buttons
+        self.questions = [
+            {"id": button["id"], "question": button["question_text"]}
+            for button in buttons
+        ]
+
+        self.by_id = {}
+        self.by_intent_type = {}
+        self.by_topic_tag = {}
+        for button in buttons:
+            self.by_id.setdefault(button["id"], button)
+            self.by_intent_type.setdefault(button["intent_type"], []).append(button)
+            self.by_topic_tag.setdefault(button["topic_tag"], []).append(button)
+
+        # Response bodies are serialized once per CSV version
+        self.questions_body = json.dumps({"buttons": self.questions}).encode()
+        self.all_body = json.dumps({"buttons": buttons}).encode()
+        self.button_bodies = {
+            button_id: json.dumps(button).encode()
+            for button_id, button in self.by_id.items()
+        }
+
+
+class ButtonCatalog:
+    """
+    In-memory quick-button catalog. The CSV is parsed once and re-read only
+    when its mtime changes; every lookup is served from a ButtonIndex.
+    """
+
+    def __init__(self, file_path: str = csv_path):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._index = None
+
+    def get(self) -> ButtonIndex:
+        mtime = os.stat(self.file_path).st_mtime_ns
+        index = self._index
+        if index is None or index.version != mtime:
+            with self._lock:
+                index = self._index
+                if index is None or index.version != mtime:
+                    index = self._load(mtime)
+                    self._index = index
+        return index
+
+    def _load(self, mtime: int) -> ButtonIndex:
+        with open(self.file_path, "rb") as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        return ButtonIndex(load_button_data(self.file_path), mtime, digest)
+
+
+button_catalog = ButtonCatalog()
+
+
 def get_button_questions() -> List[Dict[str, str]]:
-    return [
-        {"id": button["id"], "question": button["question_text"]}
-        for button in load_button_data()
-    ]
+    return button_catalog.get().questions
@@ -0,0 +1,45 @@
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+from app.utils.metrics import registry
+
+load_dotenv()
+
+# End-to-end time budget for answering one chat message
+CHAT_DEADLINE_SECONDS = float(os.getenv("CHAT_DEADLINE_SECONDS", 30))
+
+# Monotonic time by which the current request must have answered; copied into
+# tasks and worker threads started from it, like the request trace
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+deadline_exceeded = registry.counter(
+    "campusbot_deadline_exceeded_total", "Requests that ran out of time, by stage"
+)
+
+
+def set_deadline(seconds: float):
+    _deadline.set(time.monotonic() + seconds)
+
+
+def remaining() -> float | None:
+    """Seconds left for the current request, or None without a deadline"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+async def within_deadline(awaitable, stage: str):
+    """Await with whatever time the request has left; 504 when it runs out"""
+    try:
+        return await asyncio.wait_for(awaitable, remaining())
+    except asyncio.TimeoutError:
+        deadline_exceeded.inc(stage=stage)
+        raise HTTPException(
+            status_code=504, detail="The assistant took too long to answer"
+        )
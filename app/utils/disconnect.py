@@ -0,0 +1,56 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+
+from app.utils.metrics import registry
+
+load_dotenv()
+
+DISCONNECT_POLL_INTERVAL = float(os.getenv("DISCONNECT_POLL_INTERVAL", 0.5))
+# What to do with an answer that finished generating after the client left:
+# "answered" stores the turn so it shows up in history, "never" drops it
+CHAT_PERSIST_ON_DISCONNECT = os.getenv("CHAT_PERSIST_ON_DISCONNECT", "answered")
+
+client_disconnects = registry.counter(
+    "campusbot_client_disconnects_total",
+    "Requests cancelled because the client went away, by route",
+)
+
+
+@asynccontextmanager
+async def cancel_on_disconnect(request: Request):
+    """
+    Cancel the enclosing request task as soon as the client disconnects.
+
+    Cancellation propagates into every awaited step (OpenAI requests,
+    follow-up generation, queue waits), which clean up through their own
+    `except CancelledError` / `finally` blocks. The cancelled request is
+    answered with the conventional 499 "client closed request".
+    """
+    task = asyncio.current_task()
+    disconnected = asyncio.Event()
+
+    async def watch():
+        while not await request.is_disconnected():
+            await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+        disconnected.set()
+        task.cancel()
+
+    watcher = asyncio.create_task(watch())
+    try:
+        yield
+    except asyncio.CancelledError:
+        if not disconnected.is_set():
+            raise
+        # Our own cancellation, not the server shutting down. Python 3.11+
+        # keeps a cancel count that asyncio.timeout/TaskGroup read, so undo
+        # it there; 3.10 has no count and nothing to undo.
+        if hasattr(task, "uncancel"):
+            task.uncancel()
+        client_disconnects.inc(route=request.url.path)
+        raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        watcher.cancel()
@@ -1,18 +1,115 @@
-from app.utils.button_loader import load_button_data
+import threading
 
-def match_intent(user_input: str) -> dict | None:
+from app.utils.button_loader import ButtonIndex, button_catalog
+from app.utils.keyword_automaton import KeywordAutomaton, normalize_text
+
+# A full quick-button question counts far more than any single keyword
+QUESTION_TEXT_WEIGHT = 10
+
+
+class IntentMatcher:
     """
-    Rule-based intent matcher using keyword scanning from button data.
-    Returns the first matched button dictionary, or None.
+    Keyword matcher over the quick-button CSV, compiled into one
+    Aho-Corasick automaton covering every `question_keywords` entry plus each
+    button's `question_text`. Rebuilt whenever the button catalog reloads.
+
+    A keyword listed for more than one button says nothing about which one
+    was meant, so only keywords unique to a button are indexed.
     """
-    user_input_lower = user_input.lower()
 
-    for button in load_button_data():
-        keywords = button.get("question_keywords", [])
-        if not keywords:
-            continue
+    def __init__(self, catalog=button_catalog):
+        self.catalog = catalog
+        self._lock = threading.Lock()
+        # (catalog version, buttons, automaton), swapped atomically on rebuild
+        self._index = None
+
+    def match(self, user_input: str) -> dict | None:
+        """
+        Best-scoring button for the input, or None.
+
+        Returns {"button", "score", "coverage", "keywords", "ambiguous"}
+        where `score` sums the length of every distinct phrase matched for
+        that button, `coverage` is the share of the (normalized) input those
+        phrases span and `ambiguous` is set when another button scored the
+        same.
+        """
+        buttons, automaton = self._get_index()
+        text = normalize_text(user_input)
+        if not text:
+            return None
+
+        # button index -> {phrase: (start, end)}
+        hits = {}
+        for start, end, phrase, targets in automaton.search(text, normalized=True):
+            for button_index, weight in targets:
+                hits.setdefault(button_index, {})[phrase] = (start, end, weight)
+
+        if not hits:
+            return None
+
+        def score(item):
+            button_index, phrases = item
+            total = sum(len(p) * weight for p, (_, _, weight) in phrases.items())
+            # Ties go to the button listed first in the CSV
+            return total, -button_index
+
+        ranked = sorted(hits.items(), key=score, reverse=True)
+        button_index, phrases = ranked[0]
+        best = score(ranked[0])[0]
+        covered = set()
+        for start, end, _ in phrases.values():
+            covered.update(range(start, end))
+
+        return {
+            "button": buttons[button_index],
+            "score": best,
+            "coverage": len(covered) / len(text),
+            "keywords": sorted(phrases),
+            "ambiguous": len(ranked) > 1 and score(ranked[1])[0] == best,
+        }
 
-        for keyword in keywords:
-            if keyword.strip().lower() in user_input_lower:
-                return button 
-    return None  
+    # === Internal Helpers ===
+
+    def _get_index(self) -> tuple[list, KeywordAutomaton]:
+        catalog_index = self.catalog.get()
+        if self._index is None or self._index[0] != catalog_index.version:
+            with self._lock:
+                if self._index is None or self._index[0] != catalog_index.version:
+                    self._index = self._build(catalog_index)
+        _, buttons, automaton = self._index
+        return buttons, automaton
+
+    def _build(self, catalog_index: ButtonIndex) -> tuple:
+        buttons = catalog_index.buttons
+        keyword_buttons = {}
+        for button_index, button in enumerate(buttons):
+            for keyword in button.get("question_keywords", []):
+                keyword = normalize_text(keyword)
+                if keyword:
+                    keyword_buttons.setdefault(keyword, set()).add(button_index)
+
+        phrases = {
+            keyword: [(button_index, 1) for button_index in owners]
+            for keyword, owners in keyword_buttons.items()
+            if len(owners) == 1
+        }
+        for button_index, button in enumerate(buttons):
+            if button.get("question_text"):
+                question = normalize_text(button["question_text"])
+                phrases.setdefault(question, []).append(
+                    (button_index, QUESTION_TEXT_WEIGHT)
+                )
+
+        return catalog_index.version, buttons, KeywordAutomaton(phrases)
+
+
+intent_matcher = IntentMatcher()
+
+
+def match_intent(user_input: str) -> dict | None:
+    """
+    Rule-based intent matcher using keyword scanning from button data.
+    Returns the best-scoring matched button dictionary, or None.
+    """
+    match = intent_matcher.match(user_input)
+    return match["button"] if match else None
@@ -0,0 +1,83 @@
+import re
+from collections import deque
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse punctuation/whitespace runs into single spaces"""
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over normalized keyword phrases.
+
+    Built once from {phrase: payload}; `search` scans the input a single
+    time regardless of how many phrases are indexed and yields only
+    whole-word matches as (start, end, phrase, payload).
+    """
+
+    def __init__(self, phrases: dict):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for phrase, payload in phrases.items():
+            phrase = normalize_text(phrase)
+            if phrase:
+                self._add(phrase, payload)
+        self._build_failure_links()
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def search(self, text: str, normalized: bool = False):
+        """Yield whole-word matches in `text` as (start, end, phrase, payload)"""
+        if not normalized:
+            text = normalize_text(text)
+
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+
+            for phrase, payload in self._output[state]:
+                start = index - len(phrase) + 1
+                end = index + 1
+                # Normalized text only has single spaces between words
+                if (start == 0 or text[start - 1] == " ") and (
+                    end == len(text) or text[end] == " "
+                ):
+                    yield start, end, phrase, payload
+
+    # === Internal Helpers ===
+
+    def _add(self, phrase: str, payload):
+        state = 0
+        for char in phrase:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state].append((phrase, payload))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = (
+                    self._output[next_state] + self._output[self._fail[next_state]]
+                )
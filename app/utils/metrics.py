@@ -0,0 +1,208 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Latency buckets in seconds, from cache hits up to slow LLM calls
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+# Stages recorded during the current request, for the Server-Timing header
+_request_trace: ContextVar[list | None] = ContextVar("request_trace", default=None)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: tuple, extra: dict | None = None) -> str:
+    items = list(key) + list((extra or {}).items())
+    if not items:
+        return ""
+    body = ",".join(f'{name}="{str(value)}"' for name, value in items)
+    return "{" + body + "}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        # label key -> [bucket counts..., sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            for key, series in self._values.items():
+                for bound, count in zip(self.buckets, series):
+                    labels = _format_labels(key, {"le": bound})
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(key, {"le": "+Inf"})
+                lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Value read from a callback at scrape time; may return {labels: value}"""
+
+    def __init__(self, name: str, documentation: str, callback):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+        ]
+        try:
+            value = self.callback()
+        except Exception:
+            return lines
+        if isinstance(value, dict):
+            for labels, sample in value.items():
+                key = _label_key(dict(labels))
+                lines.append(f"{self.name}{_format_labels(key)} {sample}")
+        else:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(name, lambda: Counter(name, documentation))
+
+    def histogram(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS):
+        return self._register(name, lambda: Histogram(name, documentation, buckets))
+
+    def gauge(self, name: str, documentation: str, callback) -> Gauge:
+        return self._register(name, lambda: Gauge(name, documentation, callback))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, name: str, factory):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+
+registry = MetricsRegistry()
+
+stage_duration = registry.histogram(
+    "campusbot_stage_duration_seconds", "Time spent in each stage of a request"
+)
+request_duration = registry.histogram(
+    "campusbot_http_request_duration_seconds", "HTTP request latency by route"
+)
+openai_tokens = registry.counter(
+    "campusbot_openai_tokens_total", "OpenAI tokens consumed, by model and kind"
+)
+cache_requests = registry.counter(
+    "campusbot_cache_requests_total", "Cache lookups by cache and result (hit/miss)"
+)
+prompt_cache_ratio = registry.histogram(
+    "campusbot_openai_prompt_cache_ratio",
+    "Share of each OpenAI call's prompt tokens served from the prompt cache",
+    buckets=(0.0, 0.25, 0.5, 0.75, 0.9, 1.0),
+)
+
+
+@contextmanager
+def trace_stage(stage: str):
+    """Time a block as a named request stage (histogram + Server-Timing)"""
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started_at
+        stage_duration.observe(elapsed, stage=stage)
+        trace = _request_trace.get()
+        if trace is not None:
+            trace.append((stage, elapsed))
+
+
+def start_request_trace() -> list:
+    trace = []
+    _request_trace.set(trace)
+    return trace
+
+
+def format_server_timing(trace: list) -> str:
+    """Render recorded stages as a Server-Timing header value"""
+    return ", ".join(
+        f"{stage.replace('.', '-')};dur={elapsed * 1000:.1f}"
+        for stage, elapsed in trace
+    )
@@ -0,0 +1,37 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, Response
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(timestamp: datetime, key) -> str:
+    """Encode the (timestamp, id) of the last row of a page as an opaque cursor"""
+    raw = json.dumps([timestamp.isoformat(), str(key)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key_type=str) -> tuple:
+    """Decode a cursor produced by encode_cursor into (timestamp, key_type(id))"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, key = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(timestamp), key_type(key)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def set_next_cursor(
+    response: Response, rows: list, limit: int, timestamp_attr: str, key_attr: str
+):
+    """Expose the cursor for the next page in a response header when the page is full"""
+    if len(rows) < limit:
+        return
+    last = rows[-1]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+        getattr(last, timestamp_attr), getattr(last, key_attr)
+    )
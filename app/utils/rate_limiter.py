@@ -1,4 +1,164 @@
+import os
+import threading
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+from jose import JWTError, jwt
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import MovingWindowRateLimiter
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
-limiter = Limiter(key_func=get_remote_address)
\ No newline at end of file
+from app.services.auth import ALGORITHM, SECRET_KEY
+from app.services.redis_client import get_redis_client
+from app.services.user_cache import user_cache
+
+load_dotenv()
+
+# Shared storage so every worker counts against the same buckets;
+# falls back to per-process memory when no Redis is configured.
+RATE_LIMIT_STORAGE_URI = os.getenv(
+    "RATE_LIMIT_STORAGE_URI", os.getenv("REDIS_URL", "memory://")
+)
+
+# Per-tier request limits for /chat
+CHAT_RATE_LIMITS = {
+    "anonymous": os.getenv("CHAT_RATE_LIMIT_ANONYMOUS", "5/minute"),
+    "basic": os.getenv("CHAT_RATE_LIMIT_BASIC", "10/minute"),
+    "premium": os.getenv("CHAT_RATE_LIMIT_PREMIUM", "30/minute"),
+    "admin": os.getenv("CHAT_RATE_LIMIT_ADMIN", "100/minute"),
+}
+
+# Per-tier daily OpenAI token budgets (prompt + completion); 0 means unlimited
+DAILY_TOKEN_BUDGETS = {
+    "basic": int(os.getenv("DAILY_TOKEN_BUDGET_BASIC", 50000)),
+    "premium": int(os.getenv("DAILY_TOKEN_BUDGET_PREMIUM", 250000)),
+    "admin": int(os.getenv("DAILY_TOKEN_BUDGET_ADMIN", 0)),
+}
+
+
+def user_tier(user) -> str:
+    """Map a user (or cached user fields) to a rate-limit tier"""
+    if isinstance(user, dict):
+        role, is_premium = user.get("role"), user.get("is_premium")
+    else:
+        role, is_premium = user.role, user.is_premium
+    if role == "admin":
+        return "admin"
+    if is_premium or role == "premium":
+        return "premium"
+    return "basic"
+
+
+def get_user_or_remote_address(request: Request) -> str:
+    """Rate-limit key: the authenticated user id, else the client address"""
+    authorization = request.headers.get("Authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            if payload.get("sub"):
+                return f"user:{payload['sub']}"
+        except JWTError:
+            pass
+    return f"ip:{get_remote_address(request)}"
+
+
+def chat_rate_limit(key: str) -> str:
+    """Dynamic slowapi limit for /chat, tiered by User.role / is_premium"""
+    if not key.startswith("user:"):
+        return CHAT_RATE_LIMITS["anonymous"]
+    # get_current_user has already run by now, so the user is in the cache
+    fields = user_cache.peek(int(key.split(":", 1)[1]))
+    return CHAT_RATE_LIMITS[user_tier(fields)] if fields else CHAT_RATE_LIMITS["basic"]
+
+
+limiter = Limiter(
+    key_func=get_user_or_remote_address,
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy="moving-window",
+)
+
+# slowapi only sees HTTP requests; WebSocket chat messages are counted here,
+# against the same per-tier limits and storage
+_message_limiter = MovingWindowRateLimiter(storage_from_string(RATE_LIMIT_STORAGE_URI))
+
+
+def hit_chat_rate_limit(user) -> bool:
+    """Count one chat message outside slowapi; False once the tier limit is hit"""
+    limit = parse(CHAT_RATE_LIMITS[user_tier(user)])
+    return _message_limiter.hit(limit, "chat_ws", f"user:{user.id}")
+
+
+class TokenBudget:
+    """
+    Daily per-user budget of OpenAI tokens.
+
+    Usage is charged after each LLM call with the real prompt + completion
+    token counts and checked before the next one. Counters live in Redis
+    (shared across workers, expiring after two days) or in process memory
+    when Redis is not configured.
+    """
+
+    def __init__(self, budgets: dict = DAILY_TOKEN_BUDGETS):
+        self.budgets = budgets
+        self._use_redis = bool(os.getenv("REDIS_URL"))
+        self._local = {}
+        self._lock = threading.Lock()
+
+    @property
+    def _redis(self):
+        return get_redis_client() if self._use_redis else None
+
+    def check(self, user):
+        """Raise 429 if the user has exhausted today's token budget"""
+        budget = self.budgets[user_tier(user)]
+        if budget and self.used(user.id) >= budget:
+            raise HTTPException(
+                status_code=429,
+                detail="Daily usage limit reached, please try again tomorrow",
+            )
+
+    def charge(self, user, tokens: int):
+        """Add the tokens consumed by one LLM call to the user's daily total"""
+        if not tokens:
+            return
+        key = self._key(user.id)
+        if self._redis is not None:
+            try:
+                pipe = self._redis.pipeline()
+                pipe.incrby(key, tokens)
+                pipe.expire(key, 2 * 24 * 3600)
+                pipe.execute()
+                return
+            except Exception as e:
+                print("⚠️ Token budget Redis write failed:", e)
+
+        with self._lock:
+            # Drop counters from previous days
+            today = self._today()
+            for stale in [k for k in self._local if not k.endswith(today)]:
+                del self._local[stale]
+            self._local[key] = self._local.get(key, 0) + tokens
+
+    def used(self, user_id: int) -> int:
+        key = self._key(user_id)
+        if self._redis is not None:
+            try:
+                return int(self._redis.get(key) or 0)
+            except Exception as e:
+                print("⚠️ Token budget Redis read failed:", e)
+        with self._lock:
+            return self._local.get(key, 0)
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    def _key(self, user_id: int) -> str:
+        return f"tokens:{user_id}:{self._today()}"
+
+
+token_budget = TokenBudget()
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.utils.button_embeddings import ButtonEmbeddingIndex, button_embeddings
+
+load_dotenv()
+
+SEMANTIC_ROUTER_MIN_SCORE = float(os.getenv("SEMANTIC_ROUTER_MIN_SCORE", 0.75))
+SEMANTIC_ROUTER_MAX_BATCH = int(os.getenv("SEMANTIC_ROUTER_MAX_BATCH", 32))
+SEMANTIC_ROUTER_MAX_WAIT_MS = float(os.getenv("SEMANTIC_ROUTER_MAX_WAIT_MS", 5))
+
+
+class SemanticRouter:
+    """
+    Classifies a message to the closest quick button by cosine similarity
+    against pre-embedded button questions.
+
+    Concurrent callers are micro-batched: requests arriving within
+    `max_wait_ms` of each other (up to `max_batch`) are embedded together
+    and scored with one matrix product.
+    """
+
+    def __init__(
+        self,
+        index: ButtonEmbeddingIndex = button_embeddings,
+        min_score: float = SEMANTIC_ROUTER_MIN_SCORE,
+        max_batch: int = SEMANTIC_ROUTER_MAX_BATCH,
+        max_wait_ms: float = SEMANTIC_ROUTER_MAX_WAIT_MS,
+    ):
+        self.index = index
+        self.min_score = min_score
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self._requests = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def classify(self, text: str) -> dict | None:
+        """Best button as {"button", "score"}, or None below `min_score`"""
+        return self._submit(text).result()
+
+    async def classify_async(self, text: str) -> dict | None:
+        return await asyncio.wrap_future(self._submit(text))
+
+    def classify_batch(self, texts: list[str]) -> list[dict | None]:
+        """Score many texts at once (no queueing); used by evaluation"""
+        if not texts:
+            return []
+        buttons, scores = self.index.similarities(texts)
+        if not buttons:
+            return [None] * len(texts)
+        best = np.argmax(scores, axis=1)
+        results = []
+        for row, button_index in enumerate(best):
+            score = float(scores[row, button_index])
+            results.append(
+                {"button": buttons[button_index], "score": score}
+                if score >= self.min_score
+                else None
+            )
+        return results
+
+    # === Internal Helpers ===
+
+    def _submit(self, text: str) -> Future:
+        self._ensure_worker()
+        future = Future()
+        self._requests.put((text, future))
+        return future
+
+    def _ensure_worker(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="semantic-router", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.monotonic() + self.max_wait_ms / 1000
+            try:
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                pass
+
+            # Skip callers that gave up meanwhile (disconnect, deadline); once
+            # running, a future can no longer be cancelled under us
+            batch = [
+                (text, future)
+                for text, future in batch
+                if future.set_running_or_notify_cancel()
+            ]
+            if not batch:
+                continue
+
+            try:
+                results = self.classify_batch([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+semantic_router = SemanticRouter()
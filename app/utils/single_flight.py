@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+from app.utils.metrics import registry
+
+load_dotenv()
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+# Set to "true" to also coalesce identical calls across workers through Redis
+SINGLE_FLIGHT_USE_REDIS = (
+    os.getenv("SINGLE_FLIGHT_USE_REDIS", "false").lower() == "true"
+)
+# Upper bound on one upstream call; a crashed leader's lock expires after this
+SINGLE_FLIGHT_LOCK_TTL = float(os.getenv("SINGLE_FLIGHT_LOCK_TTL", 60))
+# How long a published result stays readable for followers in other workers
+SINGLE_FLIGHT_RESULT_TTL = float(os.getenv("SINGLE_FLIGHT_RESULT_TTL", 5))
+SINGLE_FLIGHT_POLL_INTERVAL = float(os.getenv("SINGLE_FLIGHT_POLL_INTERVAL", 0.05))
+
+single_flight_calls = registry.counter(
+    "campusbot_single_flight_total",
+    "Coalesced calls by role (leader, follower, remote_follower)",
+)
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one execution.
+
+    The first caller for a key (the leader) awaits the coroutine function;
+    callers arriving while it is in flight await the same result.
+    With `use_redis`, the leader also takes a short Redis lock and publishes
+    its JSON result, so leaders in other workers wait for it instead of
+    repeating the call. Failures are never shared through Redis: followers
+    elsewhere simply run the call themselves once the lock is gone.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        use_redis: bool = SINGLE_FLIGHT_USE_REDIS,
+        lock_ttl: float = SINGLE_FLIGHT_LOCK_TTL,
+        result_ttl: float = SINGLE_FLIGHT_RESULT_TTL,
+    ):
+        self.namespace = namespace
+        self.use_redis = use_redis
+        self.lock_ttl = lock_ttl
+        self.result_ttl = result_ttl
+        self._in_flight = {}
+        self._waiters = {}
+
+    async def do(self, key: str, fn) -> tuple[object, bool]:
+        """Await `fn()` once per key in flight; returns (result, shared)"""
+        task = self._in_flight.get(key)
+        shared = task is not None
+        if shared:
+            single_flight_calls.inc(namespace=self.namespace, role="follower")
+        else:
+            # A task of its own, so the first caller going away (e.g. a client
+            # disconnect) doesn't cancel the call for everyone else
+            task = asyncio.ensure_future(self._lead(key, fn))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            result, remote = await asyncio.shield(task)
+        finally:
+            if not task.done():
+                self._waiters[task] -= 1
+                if not self._waiters[task]:
+                    # Every caller has gone away; stop the upstream work too
+                    task.cancel()
+        return result, shared or remote
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    # === Internal Helpers ===
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        self._waiters.pop(task, None)
+        if not task.cancelled():
+            # Mark retrieved so a failure nobody awaited isn't logged as lost
+            task.exception()
+
+    async def _lead(self, key: str, fn) -> tuple[object, bool]:
+        redis_client = self._redis()
+        if redis_client is None:
+            single_flight_calls.inc(namespace=self.namespace, role="leader")
+            return await fn(), False
+
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        lock_key = f"singleflight:{self.namespace}:lock:{digest}"
+        result_key = f"singleflight:{self.namespace}:result:{digest}"
+        token = uuid.uuid4().hex
+
+        deadline = time.monotonic() + self.lock_ttl
+        while True:
+            try:
+                # Result first: the leader publishes before releasing its lock
+                raw = redis_client.get(result_key)
+                acquired = raw is None and redis_client.set(
+                    lock_key, token, nx=True, px=int(self.lock_ttl * 1000)
+                )
+                if acquired:
+                    raw = redis_client.get(result_key)
+                    if raw is not None:
+                        self._release(redis_client, lock_key, token)
+            except Exception as e:
+                print("⚠️ Single-flight Redis lock failed:", e)
+                single_flight_calls.inc(namespace=self.namespace, role="leader")
+                return await fn(), False
+
+            if raw is not None:
+                single_flight_calls.inc(
+                    namespace=self.namespace, role="remote_follower"
+                )
+                return json.loads(raw), True
+            if acquired or time.monotonic() >= deadline:
+                break
+            await asyncio.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+
+        single_flight_calls.inc(namespace=self.namespace, role="leader")
+        try:
+            result = await fn()
+            if acquired:
+                self._publish(redis_client, result_key, result)
+            return result, False
+        finally:
+            if acquired:
+                self._release(redis_client, lock_key, token)
+
+    def _publish(self, redis_client, result_key: str, result):
+        try:
+            redis_client.set(
+                result_key, json.dumps(result), px=int(self.result_ttl * 1000)
+            )
+        except Exception as e:
+            print("⚠️ Single-flight Redis publish failed:", e)
+
+    def _release(self, redis_client, lock_key: str, token: str):
+        try:
+            # Only drop the lock if it is still ours (it may have expired)
+            if redis_client.get(lock_key) == token.encode():
+                redis_client.delete(lock_key)
+        except Exception as e:
+            print("⚠️ Single-flight Redis unlock failed:", e)
+
+    def _redis(self):
+        if not self.use_redis or not os.getenv("REDIS_URL"):
+            return None
+        from app.services.redis_client import get_redis_client
+
+        return get_redis_client()
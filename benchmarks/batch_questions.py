@@ -0,0 +1,179 @@
+"""
+Batch questions: runs a list of questions through CampusBot in-process (the
+same ChatService path as /chat/batch, without HTTP) and writes one NDJSON
+result per question plus a summary line.
+
+Usage:
+    # Against the configured database, Redis and OpenAI, as an existing user
+    python -m benchmarks.batch_questions faq_sheet.txt --user-id 1 \
+        --concurrency 8 --output results.ndjson
+
+    # Fully offline: fake OpenAI server, fakeredis and a throwaway SQLite
+    # database, for checking a question sheet or the pipeline itself
+    python -m benchmarks.batch_questions faq_sheet.csv --offline
+
+Questions are read one per line from a text file, or from the "question"
+column (else the first column) of a .csv file.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import time
+import uuid
+
+from benchmarks.fake_openai import FakeOpenAIServer
+from benchmarks.load_test import configure_environment, use_fake_redis
+
+
+def read_questions(path: str) -> list[str]:
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.reader(f))
+            header = [cell.strip().lower() for cell in rows[0]] if rows else []
+            if "question" in header:
+                column = header.index("question")
+                rows = rows[1:]
+            else:
+                column = 0
+            questions = [row[column] for row in rows if len(row) > column]
+        else:
+            questions = f.read().splitlines()
+    return [question.strip() for question in questions if question.strip()]
+
+
+def batch_user_id(args) -> int:
+    """The user the batch runs as: --user-id, or a fresh admin when offline"""
+    from app.database import SessionLocal
+    from app.models import User
+
+    db = SessionLocal()
+    try:
+        if not args.offline:
+            user = db.get(User, args.user_id)
+            if user is None:
+                raise SystemExit(f"❌ User {args.user_id} not found")
+            return user.id
+
+        from app.services.auth import get_password_hash
+
+        run_id = uuid.uuid4().hex[:8]
+        user = User(
+            email=f"batch-{run_id}@example.com",
+            full_name=f"Batch Runner {run_id}",
+            role="admin",
+            hashed_password=get_password_hash(run_id),
+        )
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+async def run_batch(args, questions: list[str], output) -> dict:
+    from app.database import SessionLocal
+    from app.services.batch_service import BatchRunner, create_batch_session
+
+    user_id = batch_user_id(args)
+    db = SessionLocal()
+    try:
+        title = args.title or f"Batch of {len(questions)} questions"
+        session_id = create_batch_session(db, user_id, title)
+    finally:
+        db.close()
+
+    runner = BatchRunner(
+        user_id,
+        session_id,
+        concurrency=args.concurrency,
+        model=args.model,
+        temperature=args.temperature,
+    )
+    async for result in runner.run(questions):
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+        if result["type"] == "result" and not result["success"]:
+            print(
+                f"⚠️ Question {result['index']} failed: {result['detail']}",
+                file=sys.stderr,
+            )
+    return result
+
+
+async def main_async(args):
+    questions = read_questions(args.questions)
+    if not questions:
+        raise SystemExit(f"❌ No questions in {args.questions}")
+
+    fake_openai = None
+    if args.offline:
+        fake_openai = FakeOpenAIServer(
+            latency_ms=args.llm_latency_ms, tokens_per_second=args.tokens_per_second
+        ).start()
+        configure_environment(args, fake_openai.base_url)
+        use_fake_redis(args)
+
+    from app.database import Base, engine
+    from app.services.message_writer import message_writer
+    from app.services.usage_ledger import usage_ledger
+
+    if args.offline:
+        Base.metadata.create_all(bind=engine)
+    message_writer.start()
+    usage_ledger.start()
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    started_at = time.perf_counter()
+    try:
+        summary = await run_batch(args, questions, output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        message_writer.stop()
+        usage_ledger.stop()
+        if fake_openai is not None:
+            fake_openai.stop()
+
+    print(
+        f"✅ {summary['succeeded']}/{summary['questions']} questions answered in "
+        f"{time.perf_counter() - started_at:.1f}s at concurrency "
+        f"{summary['concurrency']} (session {summary['session_id']})",
+        file=sys.stderr,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("questions", help="Text file (one per line) or .csv")
+    parser.add_argument("--output", help="NDJSON file; defaults to stdout")
+    parser.add_argument("--user-id", type=int, help="Required unless --offline")
+    parser.add_argument("--title", help="Title of the batch's chat session")
+    parser.add_argument("--concurrency", type=int)
+    parser.add_argument("--model")
+    parser.add_argument("--temperature", type=float)
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Use the fake OpenAI server, fakeredis and a throwaway SQLite DB",
+    )
+    parser.add_argument("--llm-latency-ms", type=float, default=400)
+    parser.add_argument("--tokens-per-second", type=float, default=80)
+    parser.add_argument("--database-url", help="Offline only; defaults to SQLite")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument(
+        "--real-redis",
+        action="store_true",
+        help="Offline only: use the Redis at --redis-url even if fakeredis is "
+        "installed",
+    )
+    args = parser.parse_args()
+    if not args.offline and args.user_id is None:
+        parser.error("--user-id is required unless --offline is given")
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Seed a Postgres database with a heavy chat history and compare loading a
+whole session (old behaviour) against keyset pages (new behaviour).
+
+Usage:
+    BENCH_DATABASE_URL=postgresql://... python -m benchmarks.bench_history_pagination \
+        --users 1000 --sessions-per-user 20 --messages-per-session 100
+
+Use a throwaway database: the script creates the schema and bulk-inserts rows.
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text, tuple_
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import ChatMessage, ChatSession
+
+load_dotenv()
+
+
+def seed(engine, users: int, sessions_per_user: int, messages_per_session: int):
+    """Bulk-seed users, sessions and messages with generate_series"""
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                """
+                INSERT INTO users (id, role, email, full_name, hashed_password)
+                SELECT g, 'basic', 'bench' || g || '@example.com',
+                       'Bench User ' || g, 'bench-hash-' || g
+                FROM generate_series(1, :users) AS g
+                """
+            ),
+            {"users": users},
+        )
+        conn.execute(
+            text(
+                """
+                INSERT INTO chat_sessions
+                    (session_id, user_id, created_at, title, active_pdf_type)
+                SELECT gen_random_uuid(), u, now() - (s || ' minutes')::interval,
+                       'Bench session', 'default'
+                FROM generate_series(1, :users) AS u,
+                     generate_series(1, :sessions) AS s
+                """
+            ),
+            {"users": users, "sessions": sessions_per_user},
+        )
+        conn.execute(
+            text(
+                """
+                INSERT INTO chat_messages
+                    (session_id, user_id, role, content, timestamp)
+                SELECT cs.session_id, cs.user_id,
+                       CASE WHEN m % 2 = 0 THEN 'user' ELSE 'assistant' END,
+                       repeat('lorem ipsum ', 40),
+                       cs.created_at + (m || ' seconds')::interval
+                FROM chat_sessions cs, generate_series(1, :messages) AS m
+                """
+            ),
+            {"messages": messages_per_session},
+        )
+        conn.execute(text("ANALYZE"))
+
+
+def timed(fn, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label: str, samples: list[float]):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1] if len(samples) > 1 else samples[0]
+    print(
+        f"{label:<32} p50={statistics.median(samples):8.2f}ms "
+        f"p95={p95:8.2f}ms max={samples[-1]:8.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--sessions-per-user", type=int, default=20)
+    parser.add_argument("--messages-per-session", type=int, default=100)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--skip-seed", action="store_true")
+    args = parser.parse_args()
+
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        raise SystemExit("BENCH_DATABASE_URL is not set")
+
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    if not args.skip_seed:
+        start = time.perf_counter()
+        seed(engine, args.users, args.sessions_per_user, args.messages_per_session)
+        print(f"✅ Seeded in {time.perf_counter() - start:.1f}s")
+
+    db = sessionmaker(bind=engine)()
+    total = db.query(ChatMessage).count()
+    print(f"chat_messages rows: {total}")
+
+    session = db.query(ChatSession).first()
+    session_id, user_id = session.session_id, session.user_id
+    page = args.page_size
+
+    def full_history():
+        db.query(ChatMessage).filter(ChatMessage.session_id == session_id).order_by(
+            ChatMessage.timestamp.asc()
+        ).all()
+
+    def first_page():
+        db.query(ChatMessage).filter(ChatMessage.session_id == session_id).order_by(
+            ChatMessage.timestamp.asc(), ChatMessage.id.asc()
+        ).limit(page).all()
+
+    middle = (
+        db.query(ChatMessage)
+        .filter(ChatMessage.session_id == session_id)
+        .order_by(ChatMessage.timestamp.asc(), ChatMessage.id.asc())
+        .offset(args.messages_per_session // 2)
+        .first()
+    )
+
+    def cursor_page():
+        db.query(ChatMessage).filter(
+            ChatMessage.session_id == session_id,
+            tuple_(ChatMessage.timestamp, ChatMessage.id)
+            > (middle.timestamp, middle.id),
+        ).order_by(ChatMessage.timestamp.asc(), ChatMessage.id.asc()).limit(
+            page
+        ).all()
+
+    def all_sessions():
+        db.query(ChatSession).filter(ChatSession.user_id == user_id).order_by(
+            ChatSession.created_at.desc()
+        ).all()
+
+    def sessions_page():
+        db.query(ChatSession).filter(ChatSession.user_id == user_id).order_by(
+            ChatSession.created_at.desc(), ChatSession.session_id.desc()
+        ).limit(page).all()
+
+    report("history: full load", timed(full_history, args.repeat))
+    report("history: first keyset page", timed(first_page, args.repeat))
+    report("history: mid-session cursor", timed(cursor_page, args.repeat))
+    report("sessions: full load", timed(all_sessions, args.repeat))
+    report("sessions: first keyset page", timed(sessions_page, args.repeat))
+
+    plan = db.execute(
+        text(
+            "EXPLAIN SELECT * FROM chat_messages WHERE session_id = :sid "
+            "ORDER BY timestamp, id LIMIT :page"
+        ),
+        {"sid": session_id, "page": page},
+    )
+    print("\nPlan for a keyset page:")
+    for (line,) in plan:
+        print("  ", line)
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Evaluate the embedding-based semantic intent router on a labeled set.
+
+Each row of the CSV has a `question` and the `expected_intent` (a button
+intent_type), or an empty expected_intent when the question should NOT be
+routed to a button and must go to the LLM.
+
+Usage:
+    python -m benchmarks.eval_semantic_router
+    python -m benchmarks.eval_semantic_router --data my_faq.csv \
+        --thresholds 0.6 0.7 0.75 0.8 --concurrency 32
+"""
+
+import argparse
+import csv
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.semantic_router import SemanticRouter
+
+DEFAULT_DATA = os.path.join(os.path.dirname(__file__), "data/router_eval.csv")
+
+
+def load_cases(path: str) -> list[tuple[str, str | None]]:
+    with open(path, newline="", encoding="utf-8") as f:
+        return [
+            (row["question"], row["expected_intent"].strip() or None)
+            for row in csv.DictReader(f)
+        ]
+
+
+def score(cases, predictions) -> dict:
+    """Precision/recall of routed predictions against expected intents"""
+    true_positive = false_positive = false_negative = 0
+    for (_, expected), predicted in zip(cases, predictions):
+        if predicted is not None and predicted == expected:
+            true_positive += 1
+        else:
+            if predicted is not None:
+                false_positive += 1
+            if expected is not None:
+                false_negative += 1
+    precision = true_positive / (true_positive + false_positive or 1)
+    recall = true_positive / (true_positive + false_negative or 1)
+    return {
+        "precision": precision,
+        "recall": recall,
+        "routed": true_positive + false_positive,
+    }
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--data", default=DEFAULT_DATA)
+    parser.add_argument(
+        "--thresholds", type=float, nargs="+", default=[0.6, 0.65, 0.7, 0.75, 0.8]
+    )
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cases = load_cases(args.data)
+    router = SemanticRouter(min_score=0.0)
+    questions = [question for question, _ in cases]
+
+    # Warm the model and button matrix so timings exclude loading
+    router.classify_batch(questions[:1])
+
+    raw = router.classify_batch(questions)
+    print(f"Evaluated {len(cases)} questions from {args.data}\n")
+    print(f"{'threshold':>9}  {'precision':>9}  {'recall':>6}  {'routed':>6}")
+    for threshold in args.thresholds:
+        predictions = [
+            r["button"]["intent_type"] if r and r["score"] >= threshold else None
+            for r in raw
+        ]
+        result = score(cases, predictions)
+        print(
+            f"{threshold:>9.2f}  {result['precision']:>9.2f}  "
+            f"{result['recall']:>6.2f}  {result['routed']:>6}"
+        )
+
+    # Latency: one question at a time, then concurrent micro-batched callers
+    single = []
+    for _ in range(args.repeat):
+        for question in questions:
+            start = time.perf_counter()
+            router.classify_batch([question])
+            single.append((time.perf_counter() - start) * 1000)
+
+    def timed_classify(question):
+        start = time.perf_counter()
+        router.classify(question)
+        return (time.perf_counter() - start) * 1000
+
+    concurrent = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for _ in range(args.repeat):
+            concurrent.extend(pool.map(timed_classify, questions))
+    elapsed = time.perf_counter() - started
+
+    print("\nLatency (ms)")
+    for label, samples in (("sequential", single), ("micro-batched", concurrent)):
+        print(
+            f"  {label:<14} p50={statistics.median(samples):7.2f} "
+            f"p95={percentile(samples, 0.95):7.2f} max={max(samples):7.2f}"
+        )
+    print(f"  micro-batched throughput: {len(concurrent) / elapsed:.0f} questions/s")
+
+
+if __name__ == "__main__":
+    main()
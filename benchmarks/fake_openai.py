@@ -0,0 +1,161 @@
+"""
+Minimal OpenAI-compatible chat completions server for offline benchmarks.
+
+Answers POST /v1/chat/completions with canned content after a delay of
+`latency_ms + completion_tokens / tokens_per_second`, reporting realistic
+`usage`. Handles the three shapes CampusBot sends: plain completions
+(follow-up generation), `response_format` json_schema and tool-call
+structured output (ResponseFormatter).
+
+Usage:
+    python -m benchmarks.fake_openai --port 8765 --latency-ms 400 --tokens-per-second 80
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake uvicorn app.main:app
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = (
+    "New Mexico has several strong options. Compare tuition, program "
+    "accreditation and housing costs, then check each college's admissions "
+    "page for deadlines and required documents."
+)
+FOLLOWUP = "Would you like a comparison of tuition at those colleges?"
+FOLLOWUPS_TEXT = (
+    "What scholarships are available for first-year students?\n"
+    "2. How do I apply for on-campus housing?\n"
+    "3. Which programs have the best job placement rates?"
+)
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class FakeOpenAIServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 300,
+        tokens_per_second: float = 100,
+    ):
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.requests = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake-openai", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def completion(self, body: dict) -> dict:
+        """Build a chat.completion response for a request body"""
+        self.requests += 1
+        prompt_tokens = sum(
+            _estimate_tokens(str(message.get("content") or ""))
+            for message in body.get("messages", [])
+        )
+        message = {"role": "assistant", "content": None}
+        finish_reason = "stop"
+
+        structured = json.dumps({"answer": ANSWER, "followup_question": FOLLOWUP})
+        if body.get("tools"):
+            function_name = body["tools"][0]["function"]["name"]
+            message["tool_calls"] = [
+                {
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "type": "function",
+                    "function": {"name": function_name, "arguments": structured},
+                }
+            ]
+            finish_reason = "tool_calls"
+            completion_text = structured
+        elif (body.get("response_format") or {}).get("type") == "json_schema":
+            message["content"] = completion_text = structured
+        else:
+            message["content"] = completion_text = FOLLOWUPS_TEXT
+
+        completion_tokens = _estimate_tokens(completion_text)
+        time.sleep(
+            self.latency_ms / 1000 + completion_tokens / max(self.tokens_per_second, 1)
+        )
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [
+                {"index": 0, "message": message, "finish_reason": finish_reason}
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.endswith("/chat/completions"):
+                    self._send(404, {"error": {"message": f"{self.path} not faked"}})
+                    return
+                self._send(200, server.completion(body))
+
+            def _send(self, status: int, payload: dict):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--tokens-per-second", type=float, default=100)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(
+        args.host, args.port, args.latency_ms, args.tokens_per_second
+    ).start()
+    print(f"✅ Fake OpenAI listening on {server.base_url}")
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
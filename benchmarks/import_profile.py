@@ -0,0 +1,113 @@
+"""
+Profile worker startup: import time (from `python -X importtime`) and peak
+RSS after importing a module, with optional budgets for CI.
+
+Usage:
+    python -m benchmarks.import_profile                      # report for app.main
+    python -m benchmarks.import_profile --top 40 --module app.routers.auth
+    python -m benchmarks.import_profile --max-seconds 2.5 --max-rss-mb 250
+    python -m benchmarks.import_profile --forbid langchain --forbid torch
+
+Exits non-zero when a budget is exceeded or a forbidden package was imported,
+so it can gate CI. Importing app.main must not pull in the LLM/embedding
+stack; the CI target is:
+
+    python -m benchmarks.import_profile --max-seconds 1.5 --max-rss-mb 150 \
+        --forbid langchain --forbid langchain_community --forbid torch \
+        --forbid transformers --forbid faiss
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+# Runs in a fresh interpreter so nothing is already imported
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"seconds": elapsed, "rss_mb": rss_kb / 1024,
+                  "modules": sorted(sys.modules)}}))
+"""
+
+
+def parse_importtime(stderr: str) -> list[tuple[int, int, str]]:
+    """Parse `-X importtime` lines into (self_us, cumulative_us, module)"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--max-seconds", type=float)
+    parser.add_argument("--max-rss-mb", type=float)
+    parser.add_argument(
+        "--forbid",
+        action="append",
+        default=[],
+        help="top-level package that must not be imported (repeatable)",
+    )
+    args = parser.parse_args()
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=args.module)],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        print(proc.stderr[-4000:])
+        raise SystemExit(f"❌ Importing {args.module} failed")
+
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    rows = parse_importtime(proc.stderr)
+
+    # Top-level packages ranked by their cumulative import cost
+    packages = {}
+    for _, cumulative_us, name in rows:
+        if not name.startswith("  "):
+            top = name.strip().split(".")[0]
+            packages[top] = packages.get(top, 0) + cumulative_us
+
+    print(f"Import profile for {args.module}")
+    print(f"  wall time: {result['seconds']:.3f}s")
+    print(f"  peak RSS:  {result['rss_mb']:.1f} MB")
+    print(f"  modules:   {len(result['modules'])}")
+    print(f"\nTop {args.top} top-level packages by cumulative import time:")
+    for name, cumulative_us in sorted(packages.items(), key=lambda kv: -kv[1])[
+        : args.top
+    ]:
+        print(f"  {cumulative_us / 1000:10.1f} ms  {name}")
+
+    failures = []
+    if args.max_seconds is not None and result["seconds"] > args.max_seconds:
+        failures.append(
+            f"import took {result['seconds']:.2f}s (budget {args.max_seconds}s)"
+        )
+    if args.max_rss_mb is not None and result["rss_mb"] > args.max_rss_mb:
+        failures.append(
+            f"RSS {result['rss_mb']:.0f} MB (budget {args.max_rss_mb} MB)"
+        )
+    loaded_packages = {m.split(".")[0] for m in result["modules"]}
+    for package in args.forbid:
+        if package in loaded_packages:
+            failures.append(f"{package} was imported")
+
+    if failures:
+        for failure in failures:
+            print("❌", failure)
+        raise SystemExit(1)
+    print("\n✅ Within budget")
+
+
+if __name__ == "__main__":
+    main()
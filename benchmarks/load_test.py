@@ -0,0 +1,294 @@
+"""
+Offline load test: runs the whole app in-process against a fake OpenAI
+server, fakeredis (or a local Redis) and a throwaway SQLite database (or a
+local Postgres), then drives chat, history and upload workloads at a fixed
+concurrency and reports throughput, latency percentiles and memory.
+
+Usage:
+    python -m benchmarks.load_test --users 20 --requests 500 --concurrency 32 \
+        --llm-latency-ms 400 --tokens-per-second 80 --faq-ratio 0.3
+
+    # Against real local services instead of the in-memory fakes
+    python -m benchmarks.load_test --database-url postgresql://... \
+        --redis-url redis://localhost:6379/15
+
+Nothing leaves the machine: OpenAI calls go to benchmarks.fake_openai.
+Upload requests need the PDF/embedding stack and are off unless --upload-ratio
+is set.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+
+from benchmarks.fake_openai import FakeOpenAIServer
+
+LLM_QUESTIONS = [
+    "Which colleges in New Mexico are best for nursing?",
+    "Compare tuition between UNM and NMSU for out-of-state students",
+    "What should I include in a transfer application essay?",
+    "How competitive is admission to engineering programs here?",
+    "Can you plan a four-year course schedule for computer science?",
+]
+# Quick-button questions from app/rag/quickbuttons(Sheet1).csv, which the FAQ
+# fast path answers without calling the LLM
+FAQ_QUESTIONS = [
+    "How can I apply to Rio Grande University?",
+    "Who can students contact for financial aid assistance?",
+    "How can prospective students schedule a campus tour?",
+]
+
+
+def configure_environment(args, fake_openai_url: str):
+    """Point the app at local fakes; must run before anything imports `app`"""
+    database_url = args.database_url or (
+        "sqlite:///" + os.path.join(tempfile.mkdtemp(), "load_test.db")
+    )
+    overrides = {
+        "DATABASE_URL": database_url,
+        "REDIS_URL": args.redis_url,
+        "OPENAI_API_KEY": "sk-load-test",
+        "OPENAI_BASE_URL": fake_openai_url,
+        "OPENAI_API_BASE": fake_openai_url,
+        "SECRET_KEY": "load-test-secret",
+        "WARMUP_LLM": "false",
+        "SEMANTIC_ROUTER_ENABLED": "false",
+        "BCRYPT_ROUNDS": "4",
+        "RATE_LIMIT_STORAGE_URI": "memory://",
+        "MESSAGE_JOURNAL_PATH": os.path.join(tempfile.mkdtemp(), "journal.jsonl"),
+    }
+    for tier in ("ANONYMOUS", "BASIC", "PREMIUM", "ADMIN"):
+        overrides[f"CHAT_RATE_LIMIT_{tier}"] = "1000000/minute"
+    for tier in ("BASIC", "PREMIUM", "ADMIN"):
+        overrides[f"DAILY_TOKEN_BUDGET_{tier}"] = "0"
+    os.environ.update(overrides)
+    return database_url
+
+
+def use_fake_redis(args):
+    """Swap in fakeredis unless a real Redis URL was requested"""
+    if args.real_redis:
+        return "redis"
+    try:
+        import fakeredis
+    except ImportError:
+        print("⚠️ fakeredis not installed; using the Redis at", args.redis_url)
+        return "redis"
+
+    from app.services.redis_client import use_redis_client
+
+    use_redis_client(fakeredis.FakeRedis())
+    return "fakeredis"
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class LoadTest:
+    def __init__(self, client, args):
+        self.client = client
+        self.args = args
+        self.tokens = []
+        self.sessions = defaultdict(list)
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.random = random.Random(args.seed)
+
+    async def register_users(self):
+        run_id = uuid.uuid4().hex[:8]
+        for i in range(self.args.users):
+            response = await self.client.post(
+                "/auth/register",
+                json={
+                    "email": f"load-{run_id}-{i}@example.com",
+                    "full_name": f"Load User {i}",
+                    "password": "load-test-password",
+                },
+            )
+            response.raise_for_status()
+            self.tokens.append(response.json()["access_token"])
+
+    async def run(self) -> float:
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+
+        async def one(i: int):
+            async with semaphore:
+                await self._dispatch(i)
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(self.args.requests)))
+        return time.perf_counter() - started_at
+
+    # === Workloads ===
+
+    async def _dispatch(self, i: int):
+        user = i % len(self.tokens)
+        roll = self.random.random()
+        if roll < self.args.upload_ratio:
+            await self._upload(user)
+        elif roll < self.args.upload_ratio + self.args.history_ratio:
+            if self.sessions[user]:
+                await self._history(user)
+            else:
+                await self._chat(user, "chat_faq", FAQ_QUESTIONS[0])
+        elif self.random.random() < self.args.faq_ratio:
+            await self._chat(user, "chat_faq", self.random.choice(FAQ_QUESTIONS))
+        else:
+            # Unique suffix so LangChain's in-memory LLM cache can't answer it
+            question = f"{self.random.choice(LLM_QUESTIONS)} (#{i})"
+            await self._chat(user, "chat_llm", question)
+
+    async def _chat(self, user: int, workload: str, message: str):
+        payload = {"message": message}
+        if self.sessions[user] and self.random.random() < 0.7:
+            payload["session_id"] = self.random.choice(self.sessions[user])
+        response = await self._timed(workload, "POST", "/chat/", user, json=payload)
+        if response is not None and response.status_code == 200:
+            session_id = response.json()["session_id"]
+            if session_id not in self.sessions[user]:
+                self.sessions[user].append(session_id)
+
+    async def _history(self, user: int):
+        session_id = self.random.choice(self.sessions[user])
+        await self._timed("history", "GET", f"/chat/history/{session_id}", user)
+
+    async def _upload(self, user: int):
+        with open(self.args.upload_file, "rb") as f:
+            files = {"file": ("load.pdf", f.read(), "application/pdf")}
+        await self._timed("upload", "POST", "/files/upload-pdf", user, files=files)
+
+    async def _timed(self, workload: str, method: str, url: str, user: int, **kwargs):
+        headers = {"Authorization": f"Bearer {self.tokens[user]}"}
+        started_at = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+        except Exception as e:
+            self.errors[workload][type(e).__name__] += 1
+            return None
+        self.latencies[workload].append(time.perf_counter() - started_at)
+        if response.status_code >= 400:
+            self.errors[workload][response.status_code] += 1
+        return response
+
+    # === Reporting ===
+
+    def report(self, elapsed: float, backends: dict):
+        total = sum(len(v) for v in self.latencies.values())
+        print()
+        print(
+            "Backends: "
+            + ", ".join(f"{name}={value}" for name, value in backends.items())
+        )
+        print(
+            f"{total} requests in {elapsed:.2f}s at concurrency "
+            f"{self.args.concurrency}: {total / elapsed:.1f} req/s"
+        )
+        print()
+        print(
+            f"{'workload':<10} {'count':>6} {'req/s':>7} {'p50 ms':>8} "
+            f"{'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}  errors"
+        )
+        for workload, values in sorted(self.latencies.items()):
+            ms = [v * 1000 for v in values]
+            errors = dict(self.errors.get(workload, {})) or "-"
+            print(
+                f"{workload:<10} {len(ms):>6} {len(ms) / elapsed:>7.1f} "
+                f"{statistics.median(ms):>8.1f} {percentile(ms, 95):>8.1f} "
+                f"{percentile(ms, 99):>8.1f} {max(ms):>8.1f}  {errors}"
+            )
+        for workload, errors in self.errors.items():
+            if workload not in self.latencies:
+                print(f"{workload:<10} failed: {dict(errors)}")
+
+
+def report_memory():
+    current, peak = tracemalloc.get_traced_memory()
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        max_rss *= 1024
+    print()
+    print(
+        f"Memory: peak RSS {max_rss / 2**20:.1f} MiB, Python heap "
+        f"{current / 2**20:.1f} MiB (peak {peak / 2**20:.1f} MiB during the run)"
+    )
+
+
+async def main_async(args):
+    fake_openai = FakeOpenAIServer(
+        latency_ms=args.llm_latency_ms, tokens_per_second=args.tokens_per_second
+    ).start()
+    database_url = configure_environment(args, fake_openai.base_url)
+
+    import httpx
+
+    from app.main import app
+
+    backends = {
+        "database": database_url.split(":", 1)[0],
+        "redis": use_fake_redis(args),
+        "openai": fake_openai.base_url,
+    }
+
+    async with app.router.lifespan_context(app):
+        # Warm-up runs in the background; wait for readiness like a probe would
+        while not getattr(app.state, "ready", False):
+            if getattr(app.state, "warmup", None):
+                raise SystemExit(f"❌ Warm-up failed: {app.state.warmup['failures']}")
+            await asyncio.sleep(0.05)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://load-test", timeout=120
+        ) as client:
+            load_test = LoadTest(client, args)
+            await load_test.register_users()
+
+            tracemalloc.start()
+            elapsed = await load_test.run()
+            load_test.report(elapsed, backends)
+            report_memory()
+            tracemalloc.stop()
+
+    print(f"Fake OpenAI served {fake_openai.requests} completions")
+    fake_openai.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--llm-latency-ms", type=float, default=400)
+    parser.add_argument("--tokens-per-second", type=float, default=80)
+    parser.add_argument("--faq-ratio", type=float, default=0.3)
+    parser.add_argument("--history-ratio", type=float, default=0.2)
+    parser.add_argument("--upload-ratio", type=float, default=0.0)
+    parser.add_argument("--upload-file", default="app/rag/default.pdf")
+    parser.add_argument("--database-url", help="Defaults to a throwaway SQLite file")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument(
+        "--real-redis",
+        action="store_true",
+        help="Use the Redis at --redis-url even if fakeredis is installed",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()